@@ -1,13 +1,62 @@
 from flask import Blueprint, request, jsonify, current_app, g
 import logging
-from werkzeug.security import generate_password_hash, check_password_hash
 from bson import json_util
 import json
 from functools import wraps
 import jwt
+import os
 from datetime import datetime, timedelta
+from pymongo import UpdateOne
 
 from .database import db
+from .cache import LRUCache, cached_response, response_cache
+from .streaming import stream_page
+from .passwords import hash_password, verify_password, needs_rehash
+from . import versions
+
+# Authenticated identities are cached in-process so that token_required does not
+# hit the users collection on every request. Entries are keyed by username plus the
+# shared 'users' version counter: any account change bumps it, and the version watcher
+# carries the new value to every worker process, so no worker keeps serving a stale role
+# or a deleted user.
+identity_cache = LRUCache(
+    max_size=int(os.getenv('IDENTITY_CACHE_SIZE', 1024)),
+    ttl=float(os.getenv('IDENTITY_CACHE_TTL', 60))
+)
+
+def _identity_key(username):
+    return (username, versions.current('users'))
+
+def invalidate_identity(username):
+    """Makes every process drop its cached identities after an account was changed."""
+    identity_cache.pop(_identity_key(username))
+    versions.bump('users')
+
+def get_identity(username):
+    """Returns the user document (without password) for a username, served from cache when possible."""
+    key = _identity_key(username)
+    user = identity_cache.get(key)
+    if user is None:
+        user = db.users.find_one({"username": username}, {'password': 0})
+        if not user:
+            return None
+        identity_cache.set(key, user)
+    # Hand out a copy so request handlers cannot mutate the cached entry.
+    return dict(user)
+
+def normalize_username(username):
+    """The lookup key for case-insensitive logins, stored on each user as 'username_lower'."""
+    return username.lower()
+
+def backfill_username_lower():
+    """Adds 'username_lower' to users created before logins were index-backed."""
+    updates = [
+        UpdateOne({'_id': user['_id']}, {'$set': {'username_lower': normalize_username(user['username'])}})
+        for user in db.users.find({'username_lower': {'$exists': False}}, {'username': 1})
+    ]
+    if updates:
+        db.users.bulk_write(updates)
+        logging.info(f"Auth: Added 'username_lower' to {len(updates)} existing user(s).")
 
 def token_required(f):
     """Decorator to ensure a valid JWT is present."""
@@ -25,7 +74,7 @@ def token_required(f):
 
         try:
             data = jwt.decode(token, current_app.config['SECRET_KEY'], algorithms=["HS256"])
-            g.current_user = db.users.find_one({"username": data['username']})
+            g.current_user = get_identity(data['username'])
             if not g.current_user:
                  return jsonify({'message': 'User not found.'}), 401
         except (jwt.ExpiredSignatureError, jwt.InvalidTokenError) as e:
@@ -49,22 +98,30 @@ auth_bp = Blueprint('auth_bp', __name__)
 @auth_bp.route('/api/auth/login', methods=['POST'])
 def login():
     # Import here to avoid circular dependency with automation.py
-    from .automation import process_event
+    from .automation import dispatch_event
 
     data = request.get_json()
     if not data or 'username' not in data or 'password' not in data:
         return jsonify({'error': 'Missing username or password'}), 400
     
-    # Find user case-insensitively by using a regex with the 'i' option.
-    user = db.users.find_one({'username': {'$regex': f"^{data['username']}$", '$options': 'i'}})
-    if not user or not check_password_hash(user['password'], data['password']):
+    if not isinstance(data['username'], str):
+        return jsonify({'error': 'Invalid username or password'}), 401
+
+    # Find user case-insensitively through the indexed, normalized username.
+    user = db.users.find_one({'username_lower': normalize_username(data['username'])})
+    if not user or not verify_password(user['password'], data['password']):
         logging.warning(f"Auth: Failed login attempt for user '{data['username']}'.")
         return jsonify({'error': 'Invalid username or password'}), 401
+
+    # Upgrade the stored hash transparently when the hash parameters have changed.
+    if needs_rehash(user['password']):
+        db.users.update_one({'_id': user['_id']}, {'$set': {'password': hash_password(data['password'])}})
+        logging.info(f"Auth: Password hash of user '{user['username']}' upgraded to current parameters.")
     
     logging.info(f"Auth: User '{user['username']}' logged in successfully.")
 
     # Trigger automation event for user login
-    process_event('user_login', {'username': user['username']})
+    dispatch_event('user_login', {'username': user['username']})
     
     # Create JWT
     token = jwt.encode({
@@ -75,13 +132,15 @@ def login():
 
     # Don't send the password hash to the client
     user.pop('password', None)
+    user.pop('username_lower', None)
     return jsonify({'status': 'success', 'user': json.loads(json_util.dumps(user)), 'token': token})
 
 @auth_bp.route('/api/users/all', methods=['GET'])
 @admin_required
+@cached_response('users')
 def get_all_users():
-    users = list(db.users.find({}, {'password': 0})) # Exclude passwords
-    return json.loads(json_util.dumps(users))
+    # Exclude passwords
+    return stream_page(db.users, {}, [('username', 1)], {'password': 0, 'username_lower': 0}, serialize=json_util.dumps)
 
 @auth_bp.route('/api/users/set-role', methods=['POST'])
 @admin_required
@@ -101,6 +160,7 @@ def set_user_role():
     result = db.users.update_one({'username': username_to_change}, {'$set': {'role': new_role}})
     if result.matched_count == 0:
         return jsonify({'error': 'User not found'}), 404
+    invalidate_identity(username_to_change)
     logging.info(f"Auth: User '{username_to_change}' role changed to '{new_role}'.")
     return jsonify({'status': 'success', 'message': f"User '{username_to_change}' role updated to '{new_role}'."})
 
@@ -111,17 +171,23 @@ def create_user():
     if not data or 'username' not in data or 'password' not in data or 'role' not in data:
         return jsonify({'error': 'Missing username, password, or role'}), 400
     username = data['username']
-    if db.users.find_one({'username': username}):
+    if not isinstance(username, str) or not isinstance(data['password'], str):
+        return jsonify({'error': 'Username and password must be strings'}), 400
+    # Usernames are unique regardless of case, since logins are case-insensitive.
+    if db.users.find_one({'username_lower': normalize_username(username)}):
         return jsonify({'error': 'Username already exists'}), 409
     if data['role'] not in ['admin', 'user']:
         return jsonify({'error': 'Invalid role specified'}), 400
 
     new_user = {
         'username': username,
-        'password': generate_password_hash(data['password']),
+        'username_lower': normalize_username(username),
+        'password': hash_password(data['password']),
         'role': data['role']
     }
     db.users.insert_one(new_user)
+    versions.bump('users')
+    new_user.pop('username_lower', None)
     logging.info(f"Auth: Admin created new user '{username}' with role '{data['role']}'.")   
     new_user.pop('password', None)
     return json.loads(json_util.dumps({'status': 'success', 'user': new_user})), 201
@@ -132,10 +198,11 @@ def change_user_password():
     data = request.get_json()
     if not data or 'username' not in data or 'password' not in data:
         return jsonify({'error': 'Missing username or new password'}), 400
-    hashed_password = generate_password_hash(data['password'])
+    hashed_password = hash_password(data['password'])
     result = db.users.update_one({'username': data['username']}, {'$set': {'password': hashed_password}})
     if result.matched_count == 0:
         return jsonify({'error': 'User not found'}), 404
+    invalidate_identity(data['username'])
     logging.info(f"Auth: Password for user '{data['username']}' was changed by an admin.")
     return jsonify({'status': 'success', 'message': f"Password for '{data['username']}' has been updated."})
 
@@ -151,5 +218,11 @@ def delete_user(username):
     if user_to_delete.get('role') == 'admin' and db.users.count_documents({'role': 'admin'}) <= 1:
         return jsonify({'error': 'Cannot delete the last administrator.'}), 400
     db.users.delete_one({'username': username})
+    invalidate_identity(username)
     logging.info(f"Auth: User '{username}' was deleted by admin '{g.current_user['username']}'.")
-    return jsonify({'status': 'success', 'message': f"User '{username}' has been deleted."})
\ No newline at end of file
+    return jsonify({'status': 'success', 'message': f"User '{username}' has been deleted."})
+
+@auth_bp.route('/api/auth/cache-stats', methods=['GET'])
+@admin_required
+def identity_cache_stats():
+    return jsonify({'identity': identity_cache.stats(), 'responses': response_cache.stats()})
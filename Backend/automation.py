@@ -2,9 +2,17 @@ from flask import Blueprint, request, jsonify
 import logging
 from bson import json_util
 import json
+import os
+import threading
+from pymongo import DeleteMany, DeleteOne, UpdateOne
 
 from .database import db
 from .auth import admin_required, token_required
+from .cache import cached_response
+from .streaming import stream_page
+from . import versions
+from .dispatcher import EventDispatcher
+from .time_triggers import validate_time_condition
 
 automation_bp = Blueprint('automation_bp', __name__)
 
@@ -28,19 +36,27 @@ def create_automation_rule():
     }
 
     # Validate structure
-    if 'type' not in new_rule['trigger'] or 'type' not in new_rule['action']:
+    if not isinstance(new_rule['trigger'], dict) or not isinstance(new_rule['action'], dict) \
+            or 'type' not in new_rule['trigger'] or 'type' not in new_rule['action']:
         return jsonify({'error': 'Invalid rule structure. Trigger and action must have a type.'}), 400
+    if not isinstance(new_rule['trigger'].get('condition') or {}, dict):
+        return jsonify({'error': 'Invalid rule structure. The trigger condition must be an object.'}), 400
+    if new_rule['trigger']['type'] == 'time':
+        error = validate_time_condition(new_rule['trigger'].get('condition') or {})
+        if error:
+            return jsonify({'error': error}), 400
 
     db.automation_rules.insert_one(new_rule)
+    versions.bump('automation_rules')
     logging.info(f"Automation: Created new rule: {new_rule}")
     new_rule.pop('_id', None)
     return jsonify(new_rule), 201
 
 @automation_bp.route('/api/automation/rules', methods=['GET'])
 @token_required
+@cached_response('automation_rules')
 def get_all_rules():
-    rules = list(db.automation_rules.find({}, {'_id': 0}))
-    return jsonify(rules)
+    return stream_page(db.automation_rules, {}, [('id', 1)], {'_id': 0})
 
 @automation_bp.route('/api/automation/rules/toggle/<int:rule_id>', methods=['POST'])
 @admin_required
@@ -53,6 +69,7 @@ def toggle_rule(rule_id):
         {'_id': rule['_id']},
         {'$set': {'active': new_active_state}}
     )
+    versions.bump('automation_rules')
     logging.info(f"Automation: Toggled rule {rule_id} to {'active' if new_active_state else 'inactive'}.")
     rule['active'] = new_active_state
     rule.pop('_id', None)
@@ -65,6 +82,7 @@ def delete_rule(rule_id):
     
     if result.deleted_count == 0:
         return jsonify({'error': 'Rule not found'}), 404
+    versions.bump('automation_rules')
 
     logging.info(f"Automation: Rule {rule_id} was deleted by an admin.")
     return jsonify({'status': 'success', 'message': f"Rule #{rule_id} has been deleted."})
@@ -83,71 +101,197 @@ def create_environmental_scene():
     logging.info(f"Automation: Created new scene '{scene_name}' with settings: {data['settings']}")
     return jsonify({'status': 'success', 'scene_name': scene_name, 'settings': data['settings']}), 201
 
+class RuleIndex:
+    """Active automation rules compiled for O(1) matching of equality conditions.
+
+    Rules are grouped by trigger type and then by the set of condition keys they
+    test. Within a group the condition values are hashed, so matching an event costs
+    one dict lookup per distinct key set instead of one comparison per rule.
+    """
+
+    def __init__(self, rules):
+        self._by_trigger = {}
+        for rule in rules:
+            trigger = rule.get('trigger', {})
+            conditions = (trigger.get('condition') or {}) if isinstance(trigger, dict) else None
+            if not isinstance(conditions, dict):
+                # One malformed rule (e.g. stored before validation) must not stop all the others.
+                logging.error(f"Automation: Skipping rule {rule.get('id')} with a malformed trigger: {trigger}")
+                continue
+            keys = tuple(sorted(conditions))
+            # Values are compared as strings, which avoids type issues (e.g. spot ids from forms).
+            values = tuple(str(conditions[key]) for key in keys)
+            groups = self._by_trigger.setdefault(trigger.get('type'), {})
+            groups.setdefault(keys, {}).setdefault(values, []).append(rule)
+
+    def match(self, event_type, event_data):
+        matches = []
+        for keys, buckets in self._by_trigger.get(event_type, {}).items():
+            values = tuple(str(event_data.get(key)) for key in keys)
+            matches.extend(buckets.get(values, ()))
+        # Keep the order in which the rules were defined.
+        return sorted(matches, key=lambda rule: rule['id'])
+
+_rule_index = None
+_rule_index_version = None
+_rule_index_lock = threading.Lock()
+
+def get_rule_index():
+    """Returns the compiled rule index, rebuilding it if the rules changed in any process."""
+    global _rule_index, _rule_index_version
+    version = versions.current('automation_rules')
+    if _rule_index is None or _rule_index_version != version:
+        with _rule_index_lock:
+            if _rule_index is None or _rule_index_version != version:
+                rules = list(db.automation_rules.find({'active': True}, {'_id': 0}).sort('id', 1))
+                _rule_index = RuleIndex(rules)
+                _rule_index_version = version
+                logging.info(f"Automation: Compiled {len(rules)} active rule(s) (rules version {version}).")
+    return _rule_index
+
 def process_event(event_type, event_data={}):
     logging.info(f"Automation: Processing event '{event_type}' with data: {event_data}")
-    matching_rules = db.automation_rules.find({
-        'trigger.type': event_type,
-        'active': True
-    })
+    matching_rules = get_rule_index().match(event_type, event_data)
+    return run_rules(event_type, matching_rules, event_data)
 
+def run_rules(event_type, matching_rules, event_data={}):
+    """Executes the actions of rules matched by an event. Returns the number of failed actions."""
     triggered_count = 0
+    failed_count = 0
+    batch = ActionBatch()
     for rule in matching_rules:
-        conditions = rule.get('trigger', {}).get('condition', {})
-        is_match = True
-        # Check if all conditions in the rule are met by the event data
-        for key, value in conditions.items():
-            # A simple, robust string comparison is sufficient and avoids type issues.
-            if str(event_data.get(key)) != str(value):
-                is_match = False
-                break
-        if is_match:
-            action = rule.get('action', {})
-            if action.get('type'):
-                source_description = f"rule #{rule['id']} ('{rule['description']}')"
-                _execute_automation_action(action, source_description, event_data)
-                triggered_count += 1
+        action = rule.get('action', {})
+        if action.get('type'):
+            source_description = f"rule #{rule['id']} ('{rule['description']}')"
+            if not _execute_automation_action(action, source_description, event_data, batch):
+                failed_count += 1
+            triggered_count += 1
+
+    try:
+        batch.commit()
+    except Exception as e:
+        logging.error(f"Automation: Applying the actions of event '{event_type}' failed: {e}")
+        failed_count = triggered_count
     
     if triggered_count > 0:
         logging.info(f"Automation: Event '{event_type}' triggered {triggered_count} rule(s).")
+    return failed_count
+
+# Events raised by request handlers are processed in the background so that rule
+# matching and action writes are not part of the request latency.
+event_dispatcher = EventDispatcher(
+    process_event,
+    name='automation-events',
+    workers=int(os.getenv('AUTOMATION_WORKERS', 2)),
+    max_queue=int(os.getenv('AUTOMATION_QUEUE_SIZE', 1000)),
+    policy=os.getenv('AUTOMATION_QUEUE_POLICY', 'block'),
+    block_timeout=float(os.getenv('AUTOMATION_QUEUE_BLOCK_TIMEOUT', 1.0))
+)
+
+def dispatch_event(event_type, event_data={}):
+    """Queues an event for process_event. Returns False if the queue dropped it."""
+    return event_dispatcher.submit(event_type, event_data)
+
+
+class ActionBatch:
+    """Collects the writes of the actions fired by one event so they can be applied together.
+
+    Office state changes are merged into a single $set (later actions overwrite earlier
+    ones, as sequential updates would). Parking writes are queued per collection and
+    sent as one ordered bulk_write each.
+    """
+
+    def __init__(self):
+        self.state_changes = {}
+        self.parking_ops = {}
+        # Spots with a clear queued in parking_ops.
+        self.cleared_spots = set()
+        # Names of the version counters to bump once the writes are applied.
+        self.touched = set()
+
+    def set_state(self, **fields):
+        self.state_changes.update(fields)
+
+    def add_parking_op(self, collection_name, operation):
+        self.parking_ops.setdefault(collection_name, []).append(operation)
+
+    def flush_parking(self):
+        for collection_name, operations in self.parking_ops.items():
+            db[collection_name].bulk_write(operations, ordered=True)
+            self.touched.add('parking')
+        self.parking_ops = {}
+        self.cleared_spots = set()
+
+    def commit(self):
+        self.flush_parking()
+        if self.state_changes:
+            db.state.update_one({'_id': 'office'}, {'$set': self.state_changes})
+            self.state_changes = {}
+            self.touched.add('state')
+        if self.touched:
+            versions.bump(*sorted(self.touched))
+            self.touched = set()
 
 
 # Action Handlers
-def _action_lights_on(params, event_data):
-        db.state.update_one({'_id': 'office'}, {'$set': {'lights_on': True}})
+def _action_lights_on(params, event_data, batch):
+        batch.set_state(lights_on=True)
         logging.info("Automation: Lights turned ON by rule.")
 
-def _action_lights_off(params, event_data):
-        db.state.update_one({'_id': 'office'}, {'$set': {'lights_on': False}})
+def _action_lights_off(params, event_data, batch):
+        batch.set_state(lights_on=False)
         logging.info("Automation: Lights turned OFF by rule.")
 
-def _action_hvac_off(params, event_data):
-        db.state.update_one({'_id': 'office'}, {'$set': {'hvac_mode': 'off'}})
+def _action_hvac_off(params, event_data, batch):
+        batch.set_state(hvac_mode='off')
         logging.info("Automation: HVAC turned OFF by rule.")
 
-def _action_reserve_parking(params, event_data):
+def _action_reserve_parking(params, event_data, batch):
     spot_id = params.get('spot_id')
     username = event_data.get('username')
     if not spot_id or not username:
         logging.warning("Automation: 'reserve_parking' action missing spot_id or username context.")
         return
 
-    spot = db.parking_spots.find_one({'id': int(spot_id)})
-    if spot and spot.get('is_available'):
-        db.parking_spots.update_one({'id': int(spot_id)}, {'$set': {'is_available': False}})
-        db.reservations.insert_one({'id': int(spot_id), 'name': username})
+    # The reservation depends on the spot's current availability, so parking writes
+    # queued by earlier actions of this event must be applied first.
+    batch.flush_parking()
+
+    # Import here to avoid circular dependency with parking.py
+    from .parking import claim_spot
+    if claim_spot(int(spot_id), username) == 'reserved':
+        batch.touched.add('parking')
         logging.info(f"Automation: Reserved parking spot {spot_id} for '{username}' via rule.")
     else:
         logging.warning(f"Automation: Could not reserve spot {spot_id} for '{username}'. Spot not found or not available.")
 
-def _action_clear_parking(params, event_data):
+def _action_clear_parking(params, event_data, batch):
     spot_id = params.get('spot_id')
     if not spot_id:
         logging.warning("Automation: 'clear_parking' action missing spot_id.")
         return
     spot_id = int(spot_id)
-    db.checkins.delete_one({'id': spot_id})
-    db.reservations.delete_many({'id': spot_id})
-    db.parking_spots.update_one({'id': spot_id}, {'$set': {'is_available': True}})
+    if spot_id in batch.cleared_spots:
+        # An earlier action of this event already queued the same clear.
+        return
+    batch.cleared_spots.add(spot_id)
+    batch.add_parking_op('checkins', DeleteOne({'id': spot_id}))
+    batch.add_parking_op('reservations', DeleteMany({'id': spot_id}))
+    batch.add_parking_op('parking_spots', UpdateOne(
+        {'id': spot_id}, {'$set': {'is_available': True, 'reservation_count': 0}, '$unset': {'reservation': '', 'blocked': ''}}
+    ))
+    # The lot's free-spot counter goes up if the spot is taken now. No queued write of this
+    # batch touches the spot yet (clears are deduplicated above and reserve_parking flushes
+    # first), so the stored state is the one this clear changes. A write from another
+    # request between this read and the commit can still leave the counter off by one;
+    # the periodic lot reconcile corrects that.
+    # Import here to avoid circular dependency with parking.py
+    from .parking import DEFAULT_LOT
+    spot = db.parking_spots.find_one({'id': spot_id}, {'_id': 0, 'lot': 1, 'is_available': 1})
+    if spot and not spot.get('is_available'):
+        batch.add_parking_op('parking_lot_stats', UpdateOne(
+            {'_id': spot.get('lot', DEFAULT_LOT)}, {'$inc': {'available': 1}}, upsert=True
+        ))
     logging.info(f"Automation: Cleared parking spot {spot_id} via rule.")
 
 ACTION_HANDLERS = {
@@ -158,13 +302,22 @@ ACTION_HANDLERS = {
     'clear_parking': _action_clear_parking,
 }
 
-def _execute_automation_action(action, source_description, event_data={}):
+def _execute_automation_action(action, source_description, event_data={}, batch=None):
+    """Runs an action. Its writes go to the given batch, or are applied right away without one."""
     action_type = action.get('type')
     action_params = action.get('parameters', {})
     logging.info(f"Automation: {source_description} triggered action: '{action_type}' with params {action_params}.")
     handler = ACTION_HANDLERS.get(action_type)
     if handler:
-        handler(action_params, event_data)
+        own_batch = batch is None
+        batch = batch or ActionBatch()
+        try:
+            handler(action_params, event_data, batch)
+            if own_batch:
+                batch.commit()
+        except Exception as e:
+            logging.error(f"Automation: Action '{action_type}' requested by {source_description} failed: {e}")
+            return False
         return True
     logging.warning(f"Automation: Unknown action '{action_type}' requested by {source_description}.")
     return False
@@ -173,8 +326,14 @@ def _execute_automation_action(action, source_description, event_data={}):
 def trigger_motion():
     data = request.get_json()
     area = data.get('area', 'general') if data else 'general'    
-    process_event('motion', {'area': area})
-    return jsonify({'message': f"Motion event in '{area}' processed."}), 200
+    if not dispatch_event('motion', {'area': area}):
+        return jsonify({'error': 'Automation queue is full. Try again later.'}), 503
+    return jsonify({'message': f"Motion event in '{area}' queued."}), 202
+
+@automation_bp.route('/api/automation/dispatcher/metrics', methods=['GET'])
+@admin_required
+def dispatcher_metrics():
+    return jsonify(event_dispatcher.metrics())
 
 @automation_bp.route('/api/automation/rules/test/<int:rule_id>', methods=['POST'])
 @admin_required
@@ -0,0 +1,119 @@
+from flask import Response, make_response, request
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from . import versions
+
+
+class LRUCache:
+    """A thread-safe, size-bounded LRU cache with an optional per-entry TTL."""
+
+    def __init__(self, max_size=1024, ttl=None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._entries[key]
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        expires_at = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def pop(self, key):
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            return entry[0] if entry else None
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'ttl_seconds': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0
+            }
+
+
+response_cache = LRUCache(max_size=int(os.getenv('RESPONSE_CACHE_SIZE', 256)))
+
+def cached_response(*version_names, time_bucket=None):
+    """Caches a GET endpoint's response until one of the named version counters changes.
+
+    The cache key (endpoint, view args, query args, counter values) also serves as the
+    ETag, so clients revalidating with If-None-Match get a 304 without the view running.
+    The counter values are also sent in an X-Versions header ("name=value, ...").
+    Set time_bucket (seconds) for responses that also change with the clock.
+    Streamed responses (see streaming.stream_page) are not buffered into the cache: they
+    only get the ETag, so a revalidation can still be answered with a 304.
+    Apply it below the auth decorators so that authorization still runs first.
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            counters = sorted(versions.snapshot(*version_names).items())
+            key_parts = [
+                request.endpoint,
+                sorted(kwargs.items()),
+                sorted(request.args.items(multi=True)),
+                counters
+            ]
+            if time_bucket:
+                key_parts.append(int(time.time() // time_bucket))
+            key = json.dumps(key_parts, default=str)
+            etag = hashlib.sha1(key.encode()).hexdigest()
+
+            if request.if_none_match.contains(etag):
+                response = Response(status=304)
+            else:
+                cached = response_cache.get(key)
+                if cached is None:
+                    response = make_response(f(*args, **kwargs))
+                    if response.status_code != 200:
+                        return response
+                    if not response.is_streamed:
+                        cached = (response.get_data(), response.mimetype)
+                        response_cache.set(key, cached)
+                if cached is not None:
+                    body, mimetype = cached
+                    response = Response(body, mimetype=mimetype)
+            response.set_etag(etag)
+            response.headers['Cache-Control'] = 'no-cache'
+            response.headers['X-Versions'] = ', '.join(f'{name}={version}' for name, version in counters)
+            return response
+        return decorated_function
+    return decorator
@@ -5,6 +5,7 @@ import json
 
 from .database import db
 from .auth import token_required
+from . import versions
 
 climate_bp = Blueprint('climate_bp', __name__)
 
@@ -29,6 +30,7 @@ def control():
                 logging.warning(f"Temperature value out of bounds: {value}")
                 return jsonify({'error': 'Temperature must be between 10 and 30.'}), 400           
             db.state.update_one({'_id': 'office'}, {'$set': {'temperature': temp_value}}, upsert=True)
+            versions.bump('state')
             logging.info(f"Climate: Temperature set to {temp_value}°C")
             return jsonify({'status': 'success', 'message': f"Temperature set to {temp_value}°C"})
         
@@ -42,6 +44,7 @@ def control():
             logging.warning(f"Invalid HVAC mode specified: {value}")
             return jsonify({'error': 'Invalid HVAC mode. Use "heat", "cool", or "off".'}), 400           
         db.state.update_one({'_id': 'office'}, {'$set': {'hvac_mode': value}}, upsert=True)
+        versions.bump('state')
         logging.info(f"Climate: HVAC mode set to '{value}'")
         message = f"HVAC mode set to {value}."
         return jsonify({'status': 'success', 'message': message})
@@ -51,6 +54,7 @@ def control():
             logging.warning(f"Invalid light setting specified: {value}")
             return jsonify({'error': 'Invalid light setting. Use "on" or "off".'}), 400         
         db.state.update_one({'_id': 'office'}, {'$set': {'lights_on': (value == 'on')}}, upsert=True)
+        versions.bump('state')
         message = f"Lights turned {value}"
         logging.info(f"Climate: {message}.")
         return jsonify({'status': 'success', 'message': message})
@@ -59,10 +63,13 @@ def control():
         logging.warning(f"Invalid action specified: {action}")
         return jsonify({'error': 'Invalid action specified'}), 400
 
+def get_office_state():
+    return db.state.find_one({'_id': 'office'})
+
 @climate_bp.route('/api/climate/status', methods=['GET'])
 @token_required
 def status():
-    office_state = db.state.find_one({'_id': 'office'})
+    office_state = get_office_state()
     if not office_state:
         return jsonify({'error': 'Office state not initialized'}), 500
         
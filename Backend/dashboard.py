@@ -0,0 +1,38 @@
+from flask import Blueprint, Response, request, jsonify
+import hashlib
+import json
+import time
+from bson import json_util
+
+from .auth import token_required
+from .climate import get_office_state
+from .meeting_rooms import build_rooms_status
+from .parking import build_parking_board
+from . import versions
+
+dashboard_bp = Blueprint('dashboard_bp', __name__)
+
+DASHBOARD_VERSIONS = ('state', 'parking', 'rooms')
+
+def dashboard_etag():
+    """Builds the dashboard ETag from the in-memory version counters, without any query."""
+    counters = versions.snapshot(*DASHBOARD_VERSIONS)
+    # Room status also changes when a booking starts or ends, so the tag rolls over every minute.
+    counters['minute'] = int(time.time() // 60)
+    return hashlib.sha1(json.dumps(counters, sort_keys=True).encode()).hexdigest()
+
+@dashboard_bp.route('/api/dashboard', methods=['GET'])
+@token_required
+def get_dashboard():
+    etag = dashboard_etag()
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        response = jsonify({
+            'climate': json.loads(json_util.dumps(get_office_state())),
+            'parking': build_parking_board(),
+            'rooms': build_rooms_status()
+        })
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
@@ -27,5 +27,5 @@ except OperationFailure as e:
     logging.error(f"Database: Authentication failed. Check your username and password in the MONGO_URI. Details: {e}")
     raise
     
-# Get a handle to the database.
-db = client['office_app_db']
\ No newline at end of file
+# Get a handle to the database. MONGO_DATABASE points the app (e.g. the tests) at another one.
+db = client[os.getenv('MONGO_DATABASE', 'office_app_db')]
@@ -0,0 +1,127 @@
+import atexit
+import logging
+import queue
+import threading
+import time
+from collections import deque
+
+_STOP = object()
+
+class EventDispatcher:
+    """Runs a handler for submitted events on a bounded queue served by a worker pool.
+
+    When the queue is full, the 'drop' policy rejects the event immediately while the
+    'block' policy makes the caller wait up to block_timeout seconds for room (and
+    drops it after that). The handler may return the number of actions that failed.
+    """
+
+    def __init__(self, handler, name, workers=2, max_queue=1000, policy='block', block_timeout=1.0):
+        if policy not in ('drop', 'block'):
+            raise ValueError(f"Unknown queue policy '{policy}'. Use 'drop' or 'block'.")
+        self.handler = handler
+        self.name = name
+        self.workers = workers
+        self.policy = policy
+        self.block_timeout = block_timeout
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._threads = []
+        self._lock = threading.Lock()
+        self._accepting = True
+        self._latencies = deque(maxlen=1000)
+        self.processed = 0
+        self.dropped = 0
+        self.failed_events = 0
+        self.failed_actions = 0
+
+    def _start(self):
+        # Workers are started on first use so they are created in the process that
+        # serves requests (and not in a parent that forks workers later).
+        with self._lock:
+            if self._threads:
+                return
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._work, name=f"{self.name}-{i}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+            atexit.register(self.shutdown)
+
+    def submit(self, *args):
+        """Enqueues an event. Returns False if it was dropped."""
+        if not self._accepting:
+            logging.warning(f"Dispatcher: '{self.name}' is shutting down, event dropped.")
+            return False
+        self._start()
+        try:
+            if self.policy == 'block':
+                self._queue.put((time.monotonic(), args), timeout=self.block_timeout)
+            else:
+                self._queue.put_nowait((time.monotonic(), args))
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+            logging.warning(f"Dispatcher: '{self.name}' queue is full, event dropped.")
+            return False
+        return True
+
+    def _work(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if item is _STOP:
+                    return
+                enqueued_at, args = item
+                failed_actions = 0
+                try:
+                    failed_actions = self.handler(*args) or 0
+                except Exception as e:
+                    logging.error(f"Dispatcher: '{self.name}' handler failed for {args}: {e}")
+                    with self._lock:
+                        self.failed_events += 1
+                with self._lock:
+                    self.processed += 1
+                    self.failed_actions += failed_actions
+                    self._latencies.append(time.monotonic() - enqueued_at)
+            finally:
+                self._queue.task_done()
+
+    def shutdown(self, timeout=10.0):
+        """Stops accepting events and waits for the queued ones to be processed."""
+        self._accepting = False
+        if not self._threads:
+            return
+        deadline = time.monotonic() + timeout
+        for _ in self._threads:
+            try:
+                # A full queue must not hold shutdown past the deadline; the workers are
+                # daemon threads and end with the process.
+                self._queue.put(_STOP, timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Full:
+                logging.warning(f"Dispatcher: '{self.name}' queue still full at the shutdown deadline.")
+                break
+        for thread in self._threads:
+            thread.join(max(0.0, deadline - time.monotonic()))
+        self._threads = []
+        logging.info(f"Dispatcher: '{self.name}' drained ({self._queue.qsize()} event(s) left).")
+
+    def metrics(self):
+        with self._lock:
+            latencies = sorted(self._latencies)
+            processed, dropped = self.processed, self.dropped
+            failed_events, failed_actions = self.failed_events, self.failed_actions
+
+        def percentile(p):
+            if not latencies:
+                return None
+            return round(latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1000, 3)
+
+        return {
+            'queue_depth': self._queue.qsize(),
+            'queue_capacity': self._queue.maxsize,
+            'policy': self.policy,
+            'workers': self.workers,
+            'processed': processed,
+            'dropped': dropped,
+            'failed_events': failed_events,
+            'failed_actions': failed_actions,
+            'dispatch_latency_ms': {'p50': percentile(0.50), 'p99': percentile(0.99), 'max': percentile(1.0)}
+        }
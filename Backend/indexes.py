@@ -0,0 +1,182 @@
+import logging
+import os
+import sys
+from datetime import datetime, timezone
+from pymongo.errors import CollectionInvalid, OperationFailure
+
+from .database import db
+
+# How long ended bookings stay in 'meeting_bookings' (after being archived) before the TTL
+# monitor removes them.
+BOOKING_RETENTION_SECONDS = int(os.getenv('BOOKING_RETENTION_SECONDS', 3600))
+# Raw sensor readings are kept for a week, the 1-minute rollups for 30 days.
+SENSOR_RETENTION_SECONDS = int(os.getenv('SENSOR_RETENTION_SECONDS', 7 * 86400))
+SENSOR_ROLLUP_1M_RETENTION_SECONDS = int(os.getenv('SENSOR_ROLLUP_1M_RETENTION_SECONDS', 30 * 86400))
+
+# Collections that need options at creation time, as (collection, options).
+COLLECTIONS = [
+    # Sensors report every few seconds per zone and metric.
+    ('sensor_readings', {
+        'timeseries': {'timeField': 'ts', 'metaField': 'meta', 'granularity': 'seconds'},
+        'expireAfterSeconds': SENSOR_RETENTION_SECONDS
+    }),
+]
+
+# Every index the application relies on, as (collection, keys, options).
+# ensure_indexes() applies them at startup; creating an existing index is a no-op.
+INDEXES = [
+    ('users', [('username', 1)], {'unique': True}),
+    # Case-insensitive login lookups.
+    ('users', [('username_lower', 1)], {'unique': True}),
+    ('reservations', [('id', 1), ('name', 1)], {}),
+    ('reservations', [('name', 1)], {}),
+    ('checkins', [('id', 1)], {}),
+    ('parking_spots', [('id', 1)], {'unique': True}),
+    # Available spots in id order (keyset pages), overall and per lot.
+    ('parking_spots', [('is_available', 1), ('id', 1)], {}),
+    ('parking_spots', [('lot', 1), ('is_available', 1), ('id', 1)], {}),
+    # Board pages per lot, and per lot and floor.
+    ('parking_spots', [('lot', 1), ('id', 1)], {}),
+    ('parking_spots', [('lot', 1), ('floor', 1), ('id', 1)], {}),
+    # Violations: only spots reserved more than once are indexed.
+    ('parking_spots', [('reservation_count', 1)], {'partialFilterExpression': {'reservation_count': {'$gt': 1}}}),
+    ('meeting_bookings', [('booking_id', 1)], {'unique': True}),
+    # Room status and booking conflicts: one room, one time range.
+    ('meeting_bookings', [('room_id', 1), ('start_time', 1), ('end_time', 1)], {}),
+    # Weekly calendar: all rooms, one time range, ordered by start.
+    ('meeting_bookings', [('start_time', 1), ('end_time', 1)], {}),
+    ('meeting_bookings', [('username', 1), ('start_time', 1)], {}),
+    # The archive job: ended bookings that are not archived yet.
+    ('meeting_bookings', [('archived', 1), ('end_time', 1)], {}),
+    # Only archived copies expire, so bookings never disappear before reaching the history.
+    ('meeting_bookings', [('end_time', 1)], {'expireAfterSeconds': BOOKING_RETENTION_SECONDS, 'partialFilterExpression': {'archived': True}}),
+    ('meeting_bookings_history', [('booking_id', 1)], {'unique': True}),
+    # Utilization reports: month partitions, then room and time.
+    ('meeting_bookings_history', [('month', 1), ('room_id', 1), ('start_time', 1)], {}),
+    ('automation_rules', [('id', 1)], {'unique': True}),
+    ('automation_rules', [('trigger.type', 1), ('active', 1)], {}),
+    ('automation_rules', [('active', 1), ('id', 1)], {}),
+    # Check-ins are deleted automatically after 7 days (604800 seconds).
+    ('wellness_checkins', [('createdAt', 1)], {'expireAfterSeconds': 604800}),
+    # One rollup per scope ('user' or 'org'), user and day; also serves trend range reads.
+    ('wellness_rollups', [('scope', 1), ('username', 1), ('day', 1)], {'unique': True}),
+    # Time-series collections index meta and time automatically; this serves per-zone reads.
+    ('sensor_readings', [('meta.zone', 1), ('meta.metric', 1), ('ts', -1)], {}),
+    ('sensor_rollups_1m', [('zone', 1), ('metric', 1), ('bucket', 1)], {'unique': True}),
+    ('sensor_rollups_1m', [('bucket', 1)], {'expireAfterSeconds': SENSOR_ROLLUP_1M_RETENTION_SECONDS}),
+    ('sensor_rollups_1h', [('zone', 1), ('metric', 1), ('bucket', 1)], {'unique': True}),
+]
+
+def ensure_collections():
+    """Creates the registered collections that do not exist yet."""
+    existing = set(db.list_collection_names())
+    for collection_name, options in COLLECTIONS:
+        if collection_name in existing:
+            continue
+        try:
+            db.create_collection(collection_name, **options)
+        except CollectionInvalid:
+            # Created by another process in the meantime.
+            pass
+        except OperationFailure as e:
+            logging.error(f"Indexes: Could not create collection '{collection_name}': {e}")
+
+def ensure_indexes():
+    """Creates every registered collection and index that does not exist yet."""
+    ensure_collections()
+    for collection_name, keys, options in INDEXES:
+        try:
+            db[collection_name].create_index(keys, **options)
+        except OperationFailure as e:
+            if 'expireAfterSeconds' in options and e.code in (85, 86):
+                # The index exists without TTL or with another TTL (e.g. a changed retention).
+                _update_ttl(collection_name, keys, options)
+                continue
+            # An index with the same keys but different options, or data violating a
+            # unique index. Leave it to an operator instead of failing startup.
+            logging.error(f"Indexes: Could not create index {keys} on '{collection_name}': {e}")
+    logging.info(f"Indexes: Ensured {len(INDEXES)} index(es).")
+
+def _update_ttl(collection_name, keys, options):
+    expire_after_seconds = options['expireAfterSeconds']
+    existing = next((index for index in db[collection_name].index_information().values()
+                     if index['key'] == list(keys)), {})
+    try:
+        if existing.get('partialFilterExpression') != options.get('partialFilterExpression'):
+            # collMod can only change the TTL, not which documents the index covers.
+            raise OperationFailure('Partial filter changed')
+        db.command('collMod', collection_name, index={'keyPattern': dict(keys), 'expireAfterSeconds': expire_after_seconds})
+    except OperationFailure:
+        # Older servers cannot turn a regular index into a TTL index in place either.
+        db[collection_name].drop_index(keys)
+        db[collection_name].create_index(keys, **options)
+    logging.info(f"Indexes: Set TTL of {keys} on '{collection_name}' to {expire_after_seconds}s.")
+
+def query_shapes():
+    """The filters (and sorts) run by the API endpoints, with representative values."""
+    now = datetime.now(timezone.utc)
+    return [
+        ('users', {'username': 'user1'}, None),
+        ('users', {'username_lower': 'user1'}, None),
+        ('users', {}, {'username': 1}),
+        ('reservations', {'id': 1}, None),
+        ('reservations', {'name': 'user1'}, None),
+        ('reservations', {'id': 1, 'name': 'user1'}, None),
+        ('checkins', {'id': 1}, None),
+        ('parking_spots', {'id': 1}, None),
+        ('parking_spots', {'id': 1, 'is_available': True}, None),
+        ('parking_spots', {'is_available': True}, None),
+        ('parking_spots', {}, {'id': 1}),
+        ('parking_spots', {'is_available': True, 'id': {'$gt': 1}}, {'id': 1}),
+        ('parking_spots', {'lot': 'main', 'is_available': True, 'id': {'$gt': 1}}, {'id': 1}),
+        ('parking_spots', {'lot': 'main', 'id': {'$gt': 1}}, {'id': 1}),
+        ('parking_spots', {'lot': 'main', 'floor': 1, 'id': {'$gt': 1}}, {'id': 1}),
+        ('parking_spots', {'reservation_count': {'$gt': 1}}, None),
+        ('reservations', {'id': {'$in': [1, 2]}}, None),
+        ('meeting_bookings', {'booking_id': 'x'}, None),
+        ('meeting_bookings', {'room_id': {'$in': [1, 2]}, 'start_time': {'$lte': now}, 'end_time': {'$gt': now}}, {'start_time': 1}),
+        ('meeting_bookings', {'start_time': {'$lt': now}, 'end_time': {'$gt': now}}, {'start_time': 1, 'booking_id': 1}),
+        ('meeting_bookings', {'username': 'user1', 'end_time': {'$gt': now}}, {'start_time': 1, 'booking_id': 1}),
+        ('meeting_bookings', {'end_time': {'$lt': now}, 'archived': {'$ne': True}}, None),
+        ('meeting_bookings_history', {'month': {'$in': [now.strftime('%Y-%m')]}, 'start_time': {'$lt': now}, 'end_time': {'$gt': now}}, None),
+        ('automation_rules', {'id': 1}, None),
+        ('automation_rules', {}, {'id': -1}),
+        ('automation_rules', {}, {'id': 1}),
+        ('automation_rules', {'active': True}, {'id': 1}),
+        ('automation_rules', {'trigger.type': 'motion', 'active': True}, None),
+        ('wellness_rollups', {'scope': 'user', 'username': 'user1', 'day': {'$gte': now.strftime('%Y-%m-%d')}}, None),
+        ('sensor_rollups_1m', {'zone': 'office', 'metric': 'co2', 'bucket': {'$gte': now}}, {'bucket': 1}),
+        ('sensor_rollups_1h', {'zone': 'office', 'metric': 'co2', 'bucket': {'$gte': now}}, {'bucket': 1}),
+    ]
+
+def _plan_stages(plan):
+    yield plan.get('stage')
+    for child_key in ('inputStage', 'queryPlan'):
+        if child_key in plan:
+            yield from _plan_stages(plan[child_key])
+    for child in plan.get('inputStages', []):
+        yield from _plan_stages(child)
+
+def verify_query_plans():
+    """Explains every registered query shape and returns the ones whose winning plan is a COLLSCAN."""
+    collection_scans = []
+    for collection_name, query, sort in query_shapes():
+        command = {'find': collection_name, 'filter': query}
+        if sort:
+            command['sort'] = sort
+        explained = db.command('explain', command, verbosity='queryPlanner')
+        winning_plan = explained['queryPlanner']['winningPlan']
+        if 'COLLSCAN' in set(_plan_stages(winning_plan)):
+            collection_scans.append({'collection': collection_name, 'filter': query, 'sort': sort})
+    return collection_scans
+
+if __name__ == '__main__':
+    # python -m Backend.indexes [--verify]
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    ensure_indexes()
+    if '--verify' in sys.argv:
+        scans = verify_query_plans()
+        for scan in scans:
+            logging.error(f"Indexes: COLLSCAN on '{scan['collection']}' for filter {scan['filter']} sort {scan['sort']}")
+        logging.info(f"Indexes: {len(query_shapes()) - len(scans)}/{len(query_shapes())} query shapes are index-backed.")
+        sys.exit(1 if scans else 0)
@@ -0,0 +1,82 @@
+import atexit
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from pymongo.errors import DuplicateKeyError, PyMongoError
+
+from .database import db
+
+LEASE_TTL_SECONDS = float(os.getenv('LEADER_LEASE_TTL', 30))
+LEASE_RENEW_SECONDS = float(os.getenv('LEADER_LEASE_RENEW', 10))
+
+
+class LeaderLease:
+    """A MongoDB-backed lease that elects one process among all workers.
+
+    The lease is a document in 'leases' holding the current holder and an expiry time.
+    Every process tries to take or renew it periodically with a conditional upsert that
+    only matches while the lease is its own or has expired; when the leader dies, the
+    lease runs out and another worker takes it over on its next attempt.
+    """
+
+    def __init__(self, name, ttl=LEASE_TTL_SECONDS, renew_interval=LEASE_RENEW_SECONDS):
+        self.name = name
+        self.ttl = ttl
+        self.renew_interval = renew_interval
+        self.holder = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        # Local deadline, so a leader that cannot reach the database stops acting as one.
+        self._valid_until = 0.0
+        self._thread = None
+
+    def try_acquire(self):
+        started = time.monotonic()
+        was_leader = self.is_leader()
+        now = datetime.now(timezone.utc)
+        try:
+            db.leases.update_one(
+                {'_id': self.name, '$or': [{'holder': self.holder}, {'expires_at': {'$lt': now}}]},
+                {'$set': {'holder': self.holder, 'expires_at': now + timedelta(seconds=self.ttl)}},
+                upsert=True
+            )
+        except DuplicateKeyError:
+            # The lease exists and is held by another live process.
+            self._valid_until = 0.0
+        except PyMongoError as e:
+            logging.warning(f"Leader: Could not renew lease '{self.name}': {e}")
+        else:
+            self._valid_until = started + self.ttl
+
+        if self.is_leader() and not was_leader:
+            logging.info(f"Leader: This process ({self.holder}) now holds lease '{self.name}'.")
+        elif was_leader and not self.is_leader():
+            logging.warning(f"Leader: This process ({self.holder}) lost lease '{self.name}'.")
+        return self.is_leader()
+
+    def is_leader(self):
+        return time.monotonic() < self._valid_until
+
+    def _renew_forever(self):
+        while True:
+            time.sleep(self.renew_interval)
+            self.try_acquire()
+
+    def start(self):
+        if self._thread:
+            return
+        self.try_acquire()
+        self._thread = threading.Thread(target=self._renew_forever, name=f"lease-{self.name}", daemon=True)
+        self._thread.start()
+        atexit.register(self.release)
+
+    def release(self):
+        """Gives the lease up so another worker can take over without waiting for it to expire."""
+        if self.is_leader():
+            try:
+                db.leases.delete_one({'_id': self.name, 'holder': self.holder})
+            except PyMongoError:
+                pass
+            self._valid_until = 0.0
@@ -0,0 +1,152 @@
+from flask import Blueprint, Response, jsonify, stream_with_context
+import logging
+import os
+import queue
+import threading
+import time
+from bson import json_util
+
+from .auth import token_required
+from .climate import get_office_state
+from .meeting_rooms import build_rooms_status
+from .parking import build_parking_board
+from . import versions
+
+live_bp = Blueprint('live_bp', __name__)
+
+KEEPALIVE_SECONDS = float(os.getenv('LIVE_KEEPALIVE_SECONDS', 15))
+# Room status also changes when a booking starts or ends, which is not a write.
+ROOMS_REFRESH_SECONDS = float(os.getenv('LIVE_ROOMS_REFRESH_SECONDS', 60))
+# Every open stream holds one server thread. gunicorn.conf.py sizes each worker's threads
+# as this budget plus the threads kept free for regular API requests; streams beyond the
+# budget are refused and those clients poll instead.
+MAX_STREAMS = int(os.getenv('LIVE_STREAMS_PER_WORKER', 64))
+
+# Topic -> (version counter that signals a change, snapshot builder)
+TOPICS = {
+    'climate': ('state', get_office_state),
+    'parking': ('parking', build_parking_board),
+    'rooms': ('rooms', build_rooms_status),
+}
+
+def _format_event(topic, payload, version):
+    # The event id is the topic's version counter, so clients can tell a periodic re-push
+    # of unchanged data from a real change.
+    return f"id: {version}\nevent: {topic}\ndata: {json_util.dumps(payload)}\n\n"
+
+class LiveHub:
+    """Fans out state snapshots to every open event stream in this process.
+
+    Writes anywhere bump a version counter; the counter listener marks the matching
+    topic dirty and a single publisher thread rebuilds its snapshot once and pushes it
+    to all subscribers. Counters bumped by other worker processes reach the listener
+    through the version watcher (change stream or polling), so every worker's
+    subscribers see every change.
+    """
+
+    def __init__(self, topics):
+        self.topics = topics
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._dirty = set()
+        self._wakeup = threading.Condition(self._lock)
+        self._publisher = None
+
+    def subscribe(self):
+        """Returns a new subscriber queue, or None when this worker's stream budget is used up."""
+        subscriber = queue.Queue(maxsize=100)
+        with self._lock:
+            if len(self._subscribers) >= MAX_STREAMS:
+                return None
+            self._subscribers.add(subscriber)
+            if not self._publisher:
+                self._publisher = threading.Thread(target=self._publish_forever, name='live-publisher', daemon=True)
+                self._publisher.start()
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def is_subscribed(self, subscriber):
+        with self._lock:
+            return subscriber in self._subscribers
+
+    def subscriber_count(self):
+        with self._lock:
+            return len(self._subscribers)
+
+    def on_version_change(self, name, version):
+        with self._lock:
+            for topic, (version_name, _) in self.topics.items():
+                if version_name == name:
+                    self._dirty.add(topic)
+            self._wakeup.notify()
+
+    def snapshot(self, topic):
+        version_name, build = self.topics[topic]
+        # Read the counter first, so the snapshot is at least as new as the version it carries.
+        version = versions.current(version_name)
+        return _format_event(topic, build(), version)
+
+    def _publish_forever(self):
+        next_rooms_refresh = time.monotonic() + ROOMS_REFRESH_SECONDS
+        while True:
+            with self._lock:
+                self._wakeup.wait_for(lambda: self._dirty, timeout=max(0.0, next_rooms_refresh - time.monotonic()))
+                dirty, self._dirty = self._dirty, set()
+                subscribers = list(self._subscribers)
+            if time.monotonic() >= next_rooms_refresh:
+                dirty.add('rooms')
+                next_rooms_refresh = time.monotonic() + ROOMS_REFRESH_SECONDS
+            if not subscribers:
+                continue
+            for topic in dirty:
+                try:
+                    message = self.snapshot(topic)
+                except Exception as e:
+                    logging.error(f"Live: Failed to build '{topic}' snapshot: {e}")
+                    continue
+                for subscriber in subscribers:
+                    try:
+                        subscriber.put_nowait(message)
+                    except queue.Full:
+                        # A client that stopped reading must not hold back the others.
+                        logging.warning("Live: Dropping a slow event stream subscriber.")
+                        self.unsubscribe(subscriber)
+
+hub = LiveHub(TOPICS)
+versions.add_listener(hub.on_version_change)
+
+@live_bp.route('/api/live/stream', methods=['GET'])
+@token_required
+def stream():
+    subscriber = hub.subscribe()
+    if subscriber is None:
+        logging.warning(f"Live: Refused an event stream, {MAX_STREAMS} already open in this worker.")
+        response = jsonify({'error': 'Too many live streams. Poll instead and retry later.'})
+        response.status_code = 503
+        response.headers['Retry-After'] = '30'
+        return response
+
+    def generate():
+        try:
+            # Start every stream with the full current state.
+            for topic in hub.topics:
+                yield hub.snapshot(topic)
+            while True:
+                try:
+                    yield subscriber.get(timeout=KEEPALIVE_SECONDS)
+                except queue.Empty:
+                    if not hub.is_subscribed(subscriber):
+                        # Dropped for falling behind; ending the stream makes the client reconnect.
+                        return
+                    yield ": keepalive\n\n"
+        finally:
+            hub.unsubscribe(subscriber)
+
+    logging.info(f"Live: Event stream opened ({hub.subscriber_count()} open).")
+    return Response(stream_with_context(generate()), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
@@ -1,13 +1,24 @@
 from flask import Blueprint, request, jsonify, g
+import json
 import logging
+import os
 from datetime import datetime, timedelta, timezone
 import uuid
+from pymongo import ReplaceOne
+from pymongo.errors import DuplicateKeyError
 
 from .database import db
-from .auth import token_required
+from .auth import token_required, admin_required
+from .cache import cached_response
+from .streaming import stream_page
+from . import versions
 
 meeting_rooms_bp = Blueprint('meeting_rooms_bp', __name__)
 
+# Longest booking accepted. History reads rely on it: a booking overlapping a range starts
+# at most this long before the range.
+MAX_BOOKING_MINUTES = int(os.getenv('MAX_BOOKING_MINUTES', 24 * 60))
+
 def serialize_booking(booking):
     """Converts datetime objects in a booking to ISO 8601 strings for JSON serialization."""
     if not booking:
@@ -22,34 +33,133 @@ def serialize_booking(booking):
         serialized['end_time'] = serialized['end_time'].isoformat()
     return serialized
 
+# Bookings are listed by start time; the unique booking id breaks ties between pages.
+BOOKING_PAGE_SORT = [('start_time', 1), ('booking_id', 1)]
+
+def _booking_json(booking):
+    return json.dumps(serialize_booking(booking))
+
+def build_rooms_status(now=None):
+    """Returns every room with its current booking, using a single range query over all bookings."""
+    now = now or datetime.now(timezone.utc)
+    rooms = list(db.meeting_rooms.find({}, {'_id': 0}))
+
+    # One query for the bookings that are active right now, grouped by room in Python.
+    # Sorted by start_time so the first booking seen for a room wins, as before.
+    current_bookings = {}
+    active_bookings = db.meeting_bookings.find({
+        'room_id': {'$in': [room['id'] for room in rooms]},
+        'start_time': {'$lte': now},
+        'end_time': {'$gt': now}
+    }, {'_id': 0}).sort('start_time', 1)
+    for booking in active_bookings:
+        current_bookings.setdefault(booking['room_id'], booking)
+
+    for room in rooms:
+        current_booking = current_bookings.get(room['id'])
+        if current_booking:
+            room['status'] = 'booked'
+            room['booking'] = {
+                'booking_id': current_booking['booking_id'],
+                'username': current_booking['username'],
+                'start_time': current_booking['start_time'].isoformat(),
+                'end_time': current_booking['end_time'].isoformat()
+            }
+        else:
+            room['status'] = 'available'
+            room['booking'] = None
+    return rooms
+
+# --- Booking Engine ---
+# Each room has one document in 'meeting_room_slots' holding the time ranges of its
+# live bookings. A booking claims its range with a single conditional update on that
+# document, so the overlap check and the write happen atomically: two concurrent
+# requests for the same slot cannot both match the "no overlapping slot" filter.
+def _claim_slot(room_id, booking_id, start_time, end_time, retry=True):
+    """Atomically reserves [start_time, end_time) for a room. Returns False if it overlaps a booking."""
+    try:
+        db.meeting_room_slots.update_one(
+            {
+                '_id': room_id,
+                'slots': {'$not': {'$elemMatch': {'start_time': {'$lt': end_time}, 'end_time': {'$gt': start_time}}}}
+            },
+            {'$push': {'slots': {'booking_id': booking_id, 'start_time': start_time, 'end_time': end_time}}},
+            upsert=True
+        )
+    except DuplicateKeyError:
+        # The room document exists but did not match the filter, i.e. an overlapping slot exists.
+        # The one exception is two concurrent first bookings racing to create the document,
+        # so try once more against the document that now exists.
+        if retry:
+            return _claim_slot(room_id, booking_id, start_time, end_time, retry=False)
+        return False
+    return True
+
+def _release_slot(room_id, booking_id):
+    db.meeting_room_slots.update_one({'_id': room_id}, {'$pull': {'slots': {'booking_id': booking_id}}})
+
+def release_ended_slots(now):
+    """Drops slots of bookings that have ended so the per-room documents stay small."""
+    db.meeting_room_slots.update_many({}, {'$pull': {'slots': {'end_time': {'$lt': now}}}})
+
+def rebuild_room_slots():
+    """Rebuilds the per-room slot documents from the bookings collection (e.g. after an upgrade)."""
+    grouped = db.meeting_bookings.aggregate([
+        {'$sort': {'start_time': 1}},
+        {'$group': {
+            '_id': '$room_id',
+            'slots': {'$push': {'booking_id': '$booking_id', 'start_time': '$start_time', 'end_time': '$end_time'}}
+        }}
+    ])
+    for room in grouped:
+        db.meeting_room_slots.replace_one({'_id': room['_id']}, room, upsert=True)
+
+# --- Booking History ---
+# Ended bookings are copied into 'meeting_bookings_history' (tagged with their month,
+# which partitions the archive for range queries) and marked as archived. A TTL index on
+# end_time then removes them from the live collection, keeping it small.
+ARCHIVE_BATCH_SIZE = 500
+
+def _month_key(moment):
+    return moment.strftime('%Y-%m')
+
+def archive_ended_bookings(now):
+    """Moves ended bookings into the history collection in batches. Returns how many were archived."""
+    archived_count = 0
+    while True:
+        batch = list(db.meeting_bookings.find(
+            {'end_time': {'$lt': now}, 'archived': {'$ne': True}}, {'_id': 0}
+        ).limit(ARCHIVE_BATCH_SIZE))
+        if not batch:
+            break
+        # Upserts by booking_id make a batch safe to retry if the job dies halfway.
+        db.meeting_bookings_history.bulk_write([
+            ReplaceOne({'booking_id': booking['booking_id']}, {**booking, 'month': _month_key(booking['start_time'])}, upsert=True)
+            for booking in batch
+        ], ordered=False)
+        db.meeting_bookings.update_many(
+            {'booking_id': {'$in': [booking['booking_id'] for booking in batch]}},
+            {'$set': {'archived': True}}
+        )
+        archived_count += len(batch)
+        if len(batch) < ARCHIVE_BATCH_SIZE:
+            break
+    return archived_count
+
+def _months_between(start, end):
+    months = []
+    year, month = start.year, start.month
+    while (year, month) <= (end.year, end.month):
+        months.append(f"{year:04d}-{month:02d}")
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return months
+
 @meeting_rooms_bp.route('/api/rooms/status', methods=['GET'])
 @token_required
+@cached_response('rooms', time_bucket=60)
 def get_all_rooms_status():
     try:
-        rooms = list(db.meeting_rooms.find({}, {'_id': 0}))
-        now = datetime.now(timezone.utc)
-
-        for room in rooms:
-            # Find the current or next booking for the room
-            current_booking = db.meeting_bookings.find_one({
-                'room_id': room['id'],
-                'start_time': {'$lte': now},
-                'end_time': {'$gt': now}
-            }, sort=[('start_time', 1)])
-
-            if current_booking:
-                room['status'] = 'booked'
-                room['booking'] = {
-                    'booking_id': current_booking['booking_id'],
-                    'username': current_booking['username'],
-                    'start_time': current_booking['start_time'].isoformat(),
-                    'end_time': current_booking['end_time'].isoformat()
-                }
-            else:
-                room['status'] = 'available'
-                room['booking'] = None
-
-        return jsonify(rooms)
+        return jsonify(build_rooms_status())
     except Exception as e:
         logging.error(f"MeetingRooms: Error fetching room status: {e}")
         return jsonify({'error': 'An internal error occurred'}), 500
@@ -63,6 +173,8 @@ def book_room():
 
     room_id = data['room_id']
     duration = data['duration_minutes']
+    if not isinstance(duration, int) or isinstance(duration, bool) or not (1 <= duration <= MAX_BOOKING_MINUTES):
+        return jsonify({'error': f'duration_minutes must be a whole number between 1 and {MAX_BOOKING_MINUTES}.'}), 400
     username = g.current_user['username']
 
     try:
@@ -73,19 +185,6 @@ def book_room():
 
     end_time = start_time + timedelta(minutes=duration)
 
-    # Check for booking conflicts
-    conflict = db.meeting_bookings.find_one({
-        'room_id': room_id,
-        '$or': [
-            {'start_time': {'$lt': end_time, '$gte': start_time}},
-            {'end_time': {'$gt': start_time, '$lte': end_time}},
-            {'$and': [{'start_time': {'$lte': start_time}}, {'end_time': {'$gte': end_time}}]}
-        ]
-    })
-
-    if conflict:
-        return jsonify({'error': 'Booking conflict: This room is already booked for the requested time slot.'}), 409
-
     new_booking = {
         'booking_id': str(uuid.uuid4()),
         'room_id': room_id,
@@ -93,7 +192,17 @@ def book_room():
         'start_time': start_time,
         'end_time': end_time
     }
-    db.meeting_bookings.insert_one(new_booking)
+
+    # Check for booking conflicts and claim the slot in one atomic step
+    if not _claim_slot(room_id, new_booking['booking_id'], start_time, end_time):
+        return jsonify({'error': 'Booking conflict: This room is already booked for the requested time slot.'}), 409
+
+    try:
+        db.meeting_bookings.insert_one(new_booking)
+    except Exception:
+        _release_slot(room_id, new_booking['booking_id'])
+        raise
+    versions.bump('rooms')
     logging.info(f"MeetingRooms: Room {room_id} booked by '{username}' until {end_time.isoformat()}")
 
     return jsonify({
@@ -114,6 +223,8 @@ def cancel_booking(booking_id):
         return jsonify({'error': 'You can only cancel your own bookings.'}), 403
 
     db.meeting_bookings.delete_one({'booking_id': booking_id})
+    _release_slot(booking['room_id'], booking_id)
+    versions.bump('rooms')
     logging.info(f"MeetingRooms: Booking {booking_id} was cancelled by '{g.current_user['username']}'.")
     return jsonify({'status': 'success', 'message': 'Booking cancelled successfully.'})
 
@@ -124,12 +235,10 @@ def get_my_bookings():
     now = datetime.now(timezone.utc)
 
     # Find active or future bookings for the user
-    bookings = db.meeting_bookings.find({
-        'username': username,
-        'end_time': {'$gt': now}
-    }).sort('start_time', 1)
-
-    return jsonify([serialize_booking(b) for b in bookings])
+    return stream_page(
+        db.meeting_bookings, {'username': username, 'end_time': {'$gt': now}},
+        BOOKING_PAGE_SORT, serialize=_booking_json
+    )
 
 @meeting_rooms_bp.route('/api/rooms/bookings-for-week', methods=['GET'])
 @token_required
@@ -149,9 +258,55 @@ def get_bookings_for_week():
 
     # Correct query to find all bookings that *overlap* with the selected week.
     # A booking overlaps if it starts before the week ends AND ends after the week starts.
-    bookings = db.meeting_bookings.find({
-        'start_time': {'$lt': end_of_view},
-        'end_time': {'$gt': start_of_view}
-    }).sort('start_time', 1)
+    return stream_page(
+        db.meeting_bookings, {'start_time': {'$lt': end_of_view}, 'end_time': {'$gt': start_of_view}},
+        BOOKING_PAGE_SORT, serialize=_booking_json
+    )
+
+@meeting_rooms_bp.route('/api/rooms/utilization', methods=['GET'])
+@admin_required
+def get_room_utilization():
+    try:
+        start = datetime.fromisoformat(request.args['start_date'].replace('Z', '+00:00'))
+        end = datetime.fromisoformat(request.args['end_date'].replace('Z', '+00:00'))
+    except KeyError:
+        return jsonify({'error': 'start_date and end_date parameters are required'}), 400
+    except ValueError:
+        return jsonify({'error': 'Invalid date format. Use ISO 8601 format.'}), 400
+    if start.tzinfo is None:
+        start = start.replace(tzinfo=timezone.utc)
+    if end.tzinfo is None:
+        end = end.replace(tzinfo=timezone.utc)
+    if not (start < end <= start + timedelta(days=366)):
+        return jsonify({'error': 'end_date must be after start_date and at most one year later.'}), 400
+
+    # Only the month partitions overlapping the range are read. Bookings are filed under the
+    # month they start in, so this includes the longest booking's length before the range.
+    # Booked time is clipped to the range.
+    usage = db.meeting_bookings_history.aggregate([
+        {'$match': {
+            'month': {'$in': _months_between(start - timedelta(minutes=MAX_BOOKING_MINUTES), end)},
+            'start_time': {'$lt': end},
+            'end_time': {'$gt': start}
+        }},
+        {'$group': {
+            '_id': '$room_id',
+            'bookings': {'$sum': 1},
+            'booked_ms': {'$sum': {'$subtract': [{'$min': ['$end_time', end]}, {'$max': ['$start_time', start]}]}}
+        }}
+    ])
+    usage_by_room = {u['_id']: u for u in usage}
 
-    return jsonify([serialize_booking(b) for b in bookings])
\ No newline at end of file
+    range_minutes = (end - start).total_seconds() / 60
+    utilization = []
+    for room in db.meeting_rooms.find({}, {'_id': 0, 'id': 1, 'name': 1}).sort('id', 1):
+        room_usage = usage_by_room.get(room['id'], {})
+        booked_minutes = room_usage.get('booked_ms', 0) / 60000
+        utilization.append({
+            'room_id': room['id'],
+            'name': room['name'],
+            'bookings': room_usage.get('bookings', 0),
+            'booked_minutes': round(booked_minutes, 1),
+            'utilization': round(booked_minutes / range_minutes, 4)
+        })
+    return jsonify({'start_date': start.isoformat(), 'end_date': end.isoformat(), 'rooms': utilization})
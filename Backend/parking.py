@@ -1,59 +1,221 @@
 from flask import Blueprint, request, jsonify, g
 import logging
-from bson import json_util
-import json
+import uuid
+from datetime import datetime, timezone
+from collections import Counter
+from pymongo import DeleteOne, ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError
 
 from .database import db
-from .automation import process_event
+from .automation import dispatch_event
 from .auth import token_required, admin_required
+from .cache import cached_response
+from .streaming import DEFAULT_PAGE_LIMIT, MAX_PAGE_LIMIT, stream_page
+from . import versions
 
 parking_bp = Blueprint('parking_bp', __name__)
 
 def find_spot_by_id(spot_id):
     return db.parking_spots.find_one({'id': spot_id})
 
+SPOT_STATUSES = ('available', 'reserved', 'occupied', 'blocked')
+DEFAULT_LOT = 'main'
+# Fields a client can ask for with ?fields=; status and user come from the joins.
+SPOT_FIELDS = ('id', 'lot', 'floor', 'is_available', 'blocked', 'status', 'user')
+
+def _spot_filter(status=None, lot=None, floor=None):
+    query = {}
+    if lot is not None:
+        query['lot'] = lot
+    if floor is not None:
+        query['floor'] = floor
+    # Narrow the scan by the stored flags; the joins below decide the exact status.
+    if status == 'available':
+        query['is_available'] = True
+    elif status == 'blocked':
+        query['blocked'] = True
+    elif status in ('reserved', 'occupied'):
+        query['is_available'] = False
+    return query
+
+def _spot_projection(fields, status):
+    if fields is None:
+        return {'_id': 0, 'reservation': 0, 'reservation_count': 0, 'bulk_token': 0}
+    projection = {'_id': 0, 'id': 1}
+    projection.update({field: 1 for field in fields if field not in ('status', 'user')})
+    if status or 'status' in fields or 'user' in fields:
+        projection['blocked'] = 1
+    return projection
+
+def _join_status(spots, status=None, fields=None):
+    """Adds status and user to each spot from the check-ins and reservations, then filters by status."""
+    if fields is not None and not status and 'status' not in fields and 'user' not in fields:
+        return spots
+
+    spot_ids = [spot['id'] for spot in spots]
+    checked_in = {c['id']: c['name'] for c in db.checkins.find({'id': {'$in': spot_ids}}, {'_id': 0, 'id': 1, 'name': 1})}
+    reserved = {}
+    for r in db.reservations.find({'id': {'$in': spot_ids}}, {'_id': 0, 'id': 1, 'name': 1}):
+        reserved.setdefault(r['id'], r['name'])
+
+    detailed_spots = []
+    for spot in spots:
+        spot_id = spot['id']
+        if spot.get('blocked'):
+            spot['status'] = 'blocked'
+            spot['user'] = None
+        elif spot_id in checked_in:
+            spot['status'] = 'occupied'
+            spot['user'] = checked_in[spot_id]
+        elif spot_id in reserved:
+            spot['status'] = 'reserved'
+            spot['user'] = reserved[spot_id]
+        else:
+            spot['status'] = 'available'
+            spot['user'] = None
+        if status and spot['status'] != status:
+            continue
+        if fields is not None:
+            spot = {field: spot[field] for field in fields if field in spot}
+        detailed_spots.append(spot)
+    return detailed_spots
+
+def build_parking_board(status=None, floor=None, page=None, page_size=DEFAULT_PAGE_LIMIT, lot=None, fields=None):
+    """Returns spots with their occupancy status, built from three bulk reads joined by spot id."""
+    spots_cursor = db.parking_spots.find(_spot_filter(status, lot, floor), _spot_projection(fields, status)).sort('id', 1)
+    # Without a status filter the page can be cut in the database; a status filter
+    # depends on the joined data, so the page is cut after the join instead.
+    if page and not status:
+        spots_cursor = spots_cursor.skip((page - 1) * page_size).limit(page_size)
+    detailed_spots = _join_status(list(spots_cursor), status, fields)
+
+    if page and status:
+        start = (page - 1) * page_size
+        detailed_spots = detailed_spots[start:start + page_size]
+    return detailed_spots
+
+def stream_parking_page(status=None, lot=None, floor=None, fields=None):
+    """One keyset page of the board in id order, streamed as {"items", "next_after"}.
+
+    With a status filter a page can hold fewer than limit spots before the last one.
+    """
+    return stream_page(
+        db.parking_spots, _spot_filter(status, lot, floor), [('id', 1)], _spot_projection(fields, status),
+        transform=lambda spots: _join_status(spots, status, fields)
+    )
+
+def _parse_spot_query():
+    """Reads the shared filter arguments. Returns (arguments, error).
+
+    'paginated' tells whether keyset paging (?after= or ?limit=, checked by stream_page)
+    was asked for.
+    """
+    status = request.args.get('status')
+    if status and status not in SPOT_STATUSES:
+        return None, f"Invalid status. Use one of: {', '.join(SPOT_STATUSES)}."
+    fields = request.args.get('fields')
+    if fields is not None:
+        fields = [field for field in fields.split(',') if field]
+        unknown = [field for field in fields if field not in SPOT_FIELDS]
+        if unknown or not fields:
+            return None, f"Invalid fields. Use any of: {', '.join(SPOT_FIELDS)}."
+    return {
+        'status': status,
+        'lot': request.args.get('lot'),
+        'floor': request.args.get('floor', type=int),
+        'paginated': 'after' in request.args or 'limit' in request.args,
+        'fields': fields
+    }, None
+
 @parking_bp.get('/api/parking/spots/available')
 @token_required
+@cached_response('parking')
 def spots_available():
     logging.info("Parking: Available spots requested.")
-    available_spots_cursor = db.parking_spots.find({'is_available': True})
-    all_available = [spot['id'] for spot in available_spots_cursor]
-    return jsonify(all_available)
+    query, error = _parse_spot_query()
+    if error:
+        return jsonify({'error': error}), 400
+    if query['status'] or query['fields']:
+        return jsonify({'error': 'status and fields are not supported here; use /api/parking/all-spots.'}), 400
+    if not query['paginated']:
+        available_spots_cursor = db.parking_spots.find(_spot_filter('available', query['lot'], query['floor']), {'_id': 0, 'id': 1})
+        return jsonify([spot['id'] for spot in available_spots_cursor])
+
+    # Paginated: {'items': [spot ids], 'next_after': page token or null}.
+    return stream_page(
+        db.parking_spots, _spot_filter('available', query['lot'], query['floor']), [('id', 1)], {'_id': 0, 'id': 1},
+        transform=lambda spots: [spot['id'] for spot in spots]
+    )
 
 @parking_bp.get('/api/parking/all-spots')
 @token_required
 def get_all_spots():
-    detailed_spots = []
-    for spot in db.parking_spots.find():
-        spot_details = spot.copy()
-        spot_id = spot_details['id']
-        
-        checked_in_user = db.checkins.find_one({'id': spot_id})
-        reservation_info = db.reservations.find_one({'id': spot_id})
-
-        if checked_in_user:
-            spot_details['status'] = 'occupied'
-            spot_details['user'] = checked_in_user['name']
-        elif reservation_info:
-            spot_details['status'] = 'reserved'
-            spot_details['user'] = reservation_info['name']
-        else:
-            spot_details['status'] = 'available'
-            spot_details['user'] = None
-        logging.debug("Parking: All spots status requested.")
-        detailed_spots.append(spot_details)
-    return json.loads(json_util.dumps(detailed_spots))
+    query, error = _parse_spot_query()
+    if error:
+        return jsonify({'error': error}), 400
+
+    logging.debug("Parking: All spots status requested.")
+    if query['paginated']:
+        return stream_parking_page(
+            status=query['status'], lot=query['lot'], floor=query['floor'], fields=query['fields']
+        )
+
+    page = request.args.get('page', type=int)
+    page_size = request.args.get('page_size', DEFAULT_PAGE_LIMIT, type=int)
+    if (page is not None and page < 1) or not (1 <= page_size <= MAX_PAGE_LIMIT):
+        return jsonify({'error': f'page must be >= 1 and page_size between 1 and {MAX_PAGE_LIMIT}.'}), 400
+    return jsonify(build_parking_board(
+        status=query['status'], floor=query['floor'], page=page, page_size=page_size,
+        lot=query['lot'], fields=query['fields']
+    ))
+
+def adjust_lot_availability(deltas):
+    """Applies {lot: change in free spots} to the per-lot counters in 'parking_lot_stats'.
+
+    Every write that turns a spot available or unavailable reports it here, so the lot
+    summary is read from a handful of counter documents instead of counting spots.
+    """
+    operations = [
+        UpdateOne({'_id': lot}, {'$inc': {'available': delta}}, upsert=True)
+        for lot, delta in deltas.items() if delta
+    ]
+    if operations:
+        db.parking_lot_stats.bulk_write(operations, ordered=False)
+
+def claim_spot(spot_id, name):
+    """Reserves a spot if it is free. Returns 'reserved', 'unavailable' or 'missing'.
+
+    The availability check and the claim are one conditional update on the spot document,
+    so of any number of concurrent callers exactly one gets a free spot. The winner then
+    records the reservation; nobody else can reach that point for the same spot.
+    """
+    reservation = {'name': name, 'reserved_at': datetime.now(timezone.utc)}
+    claimed = db.parking_spots.find_one_and_update(
+        {'id': spot_id, 'is_available': True},
+        {'$set': {'is_available': False, 'reservation': reservation}, '$inc': {'reservation_count': 1}},
+        projection={'lot': 1}, return_document=ReturnDocument.AFTER
+    )
+    if claimed is None:
+        # Only failed claims pay for the extra read that tells the two cases apart.
+        return 'unavailable' if db.parking_spots.count_documents({'id': spot_id}, limit=1) else 'missing'
+    try:
+        db.reservations.insert_one({'id': spot_id, 'name': name})
+    except Exception:
+        db.parking_spots.update_one(
+            {'id': spot_id, 'reservation': reservation},
+            {'$set': {'is_available': True}, '$unset': {'reservation': ''}, '$inc': {'reservation_count': -1}}
+        )
+        raise
+    adjust_lot_availability({claimed.get('lot', DEFAULT_LOT): -1})
+    return 'reserved'
 
 def _reserve_spot(spot_id, name):
-    spot = find_spot_by_id(spot_id)
-    if not spot:
+    result = claim_spot(spot_id, name)
+    if result == 'missing':
         return 'Parking spot does not exist', 404
-
-    if not spot['is_available']:
+    if result == 'unavailable':
         return 'Parking spot is not available. Cannot reserve', 409
-    db.parking_spots.update_one({'id': spot_id}, {'$set': {'is_available': False}})
-    reservation = {'id': spot_id, 'name': name}
-    db.reservations.insert_one(reservation)
+    versions.bump('parking')
     logging.info(f"Parking: Spot {spot_id} reserved for '{name}'.")
     return f'Parking spot {spot_id} is reserved for {name}', 201
 
@@ -86,9 +248,11 @@ def my_reservations():
     logging.info(f"Parking: Reservations requested for '{name}'. Found: {my_res_ids}")
     return jsonify(my_res_ids)
 
-@parking_bp.post('/api/parking/clear-spot/<int:spot_id>')
-@admin_required
-def clear_spot(spot_id):
+def release_spot(spot_id):
+    """Removes a spot's check-in and reservations and makes it available.
+
+    Returns the number of deleted check-ins and reservations.
+    """
     # Remove check-ins
     checkin_deleted = db.checkins.delete_one({'id': spot_id})
 
@@ -96,16 +260,144 @@ def clear_spot(spot_id):
     reservations_deleted = db.reservations.delete_many({'id': spot_id})
 
     # Make the spot available
-    db.parking_spots.update_one({'id': spot_id}, {'$set': {'is_available': True}})
+    previous = db.parking_spots.find_one_and_update(
+        {'id': spot_id}, {'$set': {'is_available': True, 'reservation_count': 0}, '$unset': {'reservation': '', 'blocked': ''}},
+        projection={'lot': 1, 'is_available': 1}, return_document=ReturnDocument.BEFORE
+    )
+    if previous and not previous.get('is_available'):
+        adjust_lot_availability({previous.get('lot', DEFAULT_LOT): 1})
+    return checkin_deleted.deleted_count, reservations_deleted.deleted_count
+
+@parking_bp.post('/api/parking/clear-spot/<int:spot_id>')
+@admin_required
+def clear_spot(spot_id):
+    checkin_deleted, reservations_deleted = release_spot(spot_id)
+    versions.bump('parking')
 
     admin_user = g.current_user['username']
     logging.info(f"Parking: Spot {spot_id} was manually cleared by admin '{admin_user}'.")
     
-    if checkin_deleted.deleted_count > 0 or reservations_deleted.deleted_count > 0:
+    if checkin_deleted > 0 or reservations_deleted > 0:
         return jsonify({'status': 'success', 'message': f'Spot {spot_id} has been cleared and is now available.'})
     else:
         return jsonify({'status': 'success', 'message': f'Spot {spot_id} is now available.'})
 
+MAX_BULK_SPOTS = 1000
+BULK_ACTIONS = ('clear', 'guest-pass', 'block', 'unblock')
+
+def _is_int(value):
+    # bool is a subclass of int, but true/false are not spot ids.
+    return isinstance(value, int) and not isinstance(value, bool)
+
+def parse_spot_selection(data):
+    """Reads {'ids': [...]} or {'range': {'from': a, 'to': b}} (inclusive). Returns (ids, error)."""
+    if not data or not isinstance(data, dict):
+        return None, 'Missing ids or range in request body'
+    if 'ids' in data:
+        ids = data['ids']
+        if not isinstance(ids, list) or not all(_is_int(i) for i in ids):
+            return None, 'ids must be a list of integers'
+        ids = sorted(set(ids))
+    elif 'range' in data:
+        bounds = data['range'] if isinstance(data['range'], dict) else {}
+        first, last = bounds.get('from'), bounds.get('to')
+        if not _is_int(first) or not _is_int(last) or first > last:
+            return None, "range must be {'from': a, 'to': b} with integers a <= b"
+        if last - first + 1 > MAX_BULK_SPOTS:
+            return None, f'At most {MAX_BULK_SPOTS} spots per request'
+        ids = list(range(first, last + 1))
+    else:
+        return None, 'Missing ids or range in request body'
+    if not ids:
+        return None, 'No spots selected'
+    if len(ids) > MAX_BULK_SPOTS:
+        return None, f'At most {MAX_BULK_SPOTS} spots per request'
+    return ids, None
+
+def bulk_update_spots(action, ids):
+    """Applies one administrative action to many spots. Returns {spot_id: result}.
+
+    Every collection gets a single write for the whole selection (clearing takes two on the
+    spots). The spot update stamps
+    the spots it changed with a fresh batch token, so one read afterwards tells which
+    spots were changed, which did not qualify and which do not exist.
+    """
+    token = uuid.uuid4().hex
+    selection = {'id': {'$in': ids}}
+    if action == 'clear':
+        db.checkins.delete_many(selection)
+        db.reservations.delete_many(selection)
+        # Stamp only the spots that become available, for the lot counters; then reset the rest.
+        db.parking_spots.update_many({**selection, 'is_available': False}, {
+            '$set': {'is_available': True, 'bulk_token': token}
+        })
+        db.parking_spots.update_many(selection, {
+            '$set': {'reservation_count': 0}, '$unset': {'reservation': '', 'blocked': ''}
+        })
+        changed, unchanged = 'cleared', 'cleared'
+    elif action == 'guest-pass':
+        reservation = {'name': 'guest', 'reserved_at': datetime.now(timezone.utc)}
+        db.parking_spots.update_many({**selection, 'is_available': True}, {
+            '$set': {'is_available': False, 'reservation': reservation, 'bulk_token': token},
+            '$inc': {'reservation_count': 1}
+        })
+        changed, unchanged = 'reserved', 'unavailable'
+    elif action == 'block':
+        db.parking_spots.update_many({**selection, 'is_available': True}, {
+            '$set': {'is_available': False, 'blocked': True, 'bulk_token': token}
+        })
+        changed, unchanged = 'blocked', 'unavailable'
+    else:
+        db.parking_spots.update_many({**selection, 'blocked': True}, {
+            '$set': {'is_available': True, 'bulk_token': token}, '$unset': {'blocked': ''}
+        })
+        changed, unchanged = 'unblocked', 'not_blocked'
+
+    results = dict.fromkeys(ids, 'missing')
+    availability_change = 1 if action in ('clear', 'unblock') else -1
+    lot_deltas = Counter()
+    for spot in db.parking_spots.find(selection, {'_id': 0, 'id': 1, 'lot': 1, 'bulk_token': 1}):
+        stamped = spot.get('bulk_token') == token
+        results[spot['id']] = changed if stamped else unchanged
+        if stamped:
+            lot_deltas[spot.get('lot', DEFAULT_LOT)] += availability_change
+    adjust_lot_availability(lot_deltas)
+
+    if action == 'guest-pass':
+        reserved_ids = [spot_id for spot_id, result in results.items() if result == 'reserved']
+        if reserved_ids:
+            db.reservations.insert_many([{'id': spot_id, 'name': 'guest'} for spot_id in reserved_ids], ordered=False)
+    return results
+
+@parking_bp.post('/api/parking/bulk/<action>')
+@admin_required
+def bulk_spots(action):
+    if action not in BULK_ACTIONS:
+        return jsonify({'error': f"Invalid action. Use one of: {', '.join(BULK_ACTIONS)}."}), 404
+    ids, error = parse_spot_selection(request.get_json(silent=True))
+    if error:
+        return jsonify({'error': error}), 400
+
+    results = bulk_update_spots(action, ids)
+    changed_ids = [spot_id for spot_id, result in results.items() if result not in ('missing', 'unavailable', 'not_blocked')]
+    summary = {}
+    for result in results.values():
+        summary[result] = summary.get(result, 0) + 1
+
+    admin_user = g.current_user['username']
+    if changed_ids:
+        versions.bump('parking')
+        # One event for the whole request, however many spots it changed.
+        dispatch_event('parking_bulk_update', {
+            'action': action, 'spot_ids': changed_ids, 'count': len(changed_ids), 'username': admin_user
+        })
+    logging.info(f"Parking: Bulk '{action}' by admin '{admin_user}' on {len(ids)} spot(s): {summary}.")
+    return jsonify({
+        'action': action,
+        'summary': summary,
+        'results': [{'id': spot_id, 'result': result} for spot_id, result in results.items()]
+    })
+
 @parking_bp.post('/api/parking/unreserve')
 @token_required
 def unreserve():
@@ -121,7 +413,8 @@ def unreserve():
         return jsonify({'error': 'No reservation found for you at this spot to unreserve.'}), 404
 
     # Remove the reservation
-    db.reservations.delete_one({'id': spot_id, 'name': name})
+    if db.reservations.delete_one({'id': spot_id, 'name': name}).deleted_count:
+        db.parking_spots.update_one({'id': spot_id}, {'$inc': {'reservation_count': -1}})
 
     # Make the spot available again, but only if no one is checked in
     # and no other reservations exist for this spot.
@@ -129,9 +422,15 @@ def unreserve():
     other_reservations = db.reservations.find_one({'id': spot_id})
 
     if not is_checked_in and not other_reservations:
-        db.parking_spots.update_one({'id': spot_id}, {'$set': {'is_available': True}})
+        released = db.parking_spots.find_one_and_update(
+            {'id': spot_id, 'is_available': False, 'blocked': {'$ne': True}},
+            {'$set': {'is_available': True}, '$unset': {'reservation': ''}}, projection={'lot': 1}
+        )
+        if released:
+            adjust_lot_availability({released.get('lot', DEFAULT_LOT): 1})
         logging.info(f"Parking: Spot {spot_id} is now available after un-reservation by '{name}'.")
 
+    versions.bump('parking')
     logging.info(f"Parking: Spot {spot_id} unreserved by '{name}'.")
     return jsonify({'status': 'success', 'message': f'Reservation for spot {spot_id} has been cancelled.'}), 200
 
@@ -153,17 +452,21 @@ def checkin():
         return jsonify({'error': 'Cannot check-in. Spot is already occupied.'}), 409
 
     db.checkins.insert_one({'id': id_to_checkin, 'name': name})
+    versions.bump('parking')
     logging.info(f"Parking: '{name}' checked into spot {id_to_checkin}.")
     # Trigger automation event for parking check-in
-    process_event('parking_checkin', {'spot_id': id_to_checkin})
+    dispatch_event('parking_checkin', {'spot_id': id_to_checkin})
 
     return 'Checked in successfully', 201
 
 @parking_bp.get('/api/parking/violations')
 @admin_required
 def violations():
+    # Reservation writes keep 'reservation_count' on each spot, so only the few spots
+    # counted more than once are read, through a partial index holding just those.
+    suspect_ids = [spot['id'] for spot in db.parking_spots.find({'reservation_count': {'$gt': 1}}, {'_id': 0, 'id': 1})]
     spots_with_reservations = {}
-    for r in db.reservations.find():
+    for r in db.reservations.find({'id': {'$in': suspect_ids}}, {'_id': 0, 'id': 1, 'name': 1}):
         spots_with_reservations.setdefault(r['id'], set()).add(r['name'])
 
     all_violations = []
@@ -177,4 +480,78 @@ def violations():
             all_violations.append(violation_doc)
 
     logging.info(f"Parking: Violations check ran. Found {len(all_violations)} violations.")
-    return jsonify(all_violations)
\ No newline at end of file
+    return jsonify(all_violations)
+
+def reconcile_reservation_counts():
+    """Recomputes every spot's reservation_count from the reservations and fixes any drift.
+
+    Returns the number of corrected spots. Each correction only applies while the spot still
+    holds the count read here, so a reservation made or removed meanwhile (which also moves
+    the counter) is never overwritten with the older total.
+    """
+    observed = {spot['id']: spot.get('reservation_count')
+                for spot in db.parking_spots.find({}, {'_id': 0, 'id': 1, 'reservation_count': 1})}
+    actual = {doc['_id']: doc['count'] for doc in db.reservations.aggregate([
+        {'$group': {'_id': '$id', 'count': {'$sum': 1}}}
+    ])}
+    corrections = [
+        UpdateOne({'id': spot_id, 'reservation_count': stored}, {'$set': {'reservation_count': actual.get(spot_id, 0)}})
+        for spot_id, stored in observed.items() if stored != actual.get(spot_id, 0)
+    ]
+    if not corrections:
+        return 0
+    corrected = db.parking_spots.bulk_write(corrections, ordered=False).modified_count
+    if corrected:
+        logging.warning(f"Parking: Corrected the reservation count of {corrected} spot(s).")
+    return corrected
+
+def migrate_parking_lots():
+    """Places spots created before lots and floors existed on floor 1 of the default lot."""
+    moved = db.parking_spots.update_many({'lot': {'$exists': False}}, {'$set': {'lot': DEFAULT_LOT}}).modified_count
+    db.parking_spots.update_many({'floor': {'$exists': False}}, {'$set': {'floor': 1}})
+    if moved:
+        logging.info(f"Parking: Moved {moved} spot(s) into lot '{DEFAULT_LOT}'.")
+
+def reconcile_lot_stats():
+    """Recomputes the per-lot counters from the spots and fixes any drift. Returns the number of corrected lots.
+
+    Like reconcile_reservation_counts, a correction only applies while the lot still holds
+    the counters read here, so availability changes made meanwhile are not overwritten.
+    """
+    stored = {stats.pop('_id'): stats for stats in db.parking_lot_stats.find()}
+    actual = {doc['_id']: {'total': doc['total'], 'available': doc['available']} for doc in db.parking_spots.aggregate([
+        {'$group': {'_id': '$lot', 'total': {'$sum': 1}, 'available': {'$sum': {'$cond': ['$is_available', 1, 0]}}}}
+    ])}
+
+    def observed(lot):
+        # A missing counter (or lot document) is matched as null.
+        counts = stored.get(lot, {})
+        return {'_id': lot, 'total': counts.get('total'), 'available': counts.get('available')}
+
+    corrections = [DeleteOne(observed(lot)) for lot in stored if lot not in actual]
+    corrections.extend(
+        UpdateOne(observed(lot), {'$set': counts}, upsert=True)
+        for lot, counts in actual.items() if stored.get(lot) != counts
+    )
+    if not corrections:
+        return 0
+    try:
+        result = db.parking_lot_stats.bulk_write(corrections, ordered=False)
+        corrected = result.modified_count + result.upserted_count + result.deleted_count
+    except BulkWriteError as e:
+        # A lot document created meanwhile collides with the upsert; the next run checks it again.
+        if any(error.get('code') != 11000 for error in e.details.get('writeErrors', [])):
+            raise
+        corrected = e.details['nModified'] + e.details['nUpserted'] + e.details['nRemoved']
+    if corrected:
+        logging.info(f"Parking: Corrected the availability counters of {corrected} lot(s).")
+    return corrected
+
+@parking_bp.get('/api/parking/lots')
+@token_required
+@cached_response('parking')
+def lots_summary():
+    return jsonify([
+        {'lot': stats['_id'], 'total': stats.get('total', 0), 'available': stats.get('available', 0)}
+        for stats in db.parking_lot_stats.find().sort('_id', 1)
+    ])
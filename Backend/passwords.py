@@ -0,0 +1,73 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from werkzeug.security import generate_password_hash, check_password_hash
+
+# Hash parameters in werkzeug's method syntax, e.g. 'scrypt:32768:8:1' or 'pbkdf2:sha256:600000'.
+HASH_METHOD = os.getenv('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1')
+HASH_WORKERS = int(os.getenv('PASSWORD_HASH_WORKERS', 2))
+
+
+class PasswordHasher:
+    """Hashes and verifies passwords in a bounded pool of worker processes.
+
+    Hashing is CPU-bound and holds the GIL, so running it on the request thread stalls
+    every other request in the worker. At most max_pending hashes are queued at once;
+    further callers wait for a free slot.
+    """
+
+    def __init__(self, method=HASH_METHOD, workers=HASH_WORKERS, max_pending=None):
+        self.method = method
+        self.workers = workers
+        self._slots = threading.BoundedSemaphore(max_pending or workers * 4)
+        self._executor = None
+        self._method_prefix = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        # Created on first use so each (forked) server worker gets its own pool.
+        with self._lock:
+            if self._executor is None:
+                # Forking a threaded server worker can copy locks held by other threads
+                # into the child; forkserver starts hashers from a clean, single-threaded process.
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=multiprocessing.get_context('forkserver')
+                )
+            return self._executor
+
+    def _run(self, fn, *args):
+        with self._slots:
+            return self._get_executor().submit(fn, *args).result()
+
+    def hash(self, password):
+        return self._run(generate_password_hash, password, self.method)
+
+    def verify(self, pwhash, password):
+        return self._run(check_password_hash, pwhash, password)
+
+    def needs_rehash(self, pwhash):
+        """True if the hash was made with other parameters than the configured ones."""
+        if self._method_prefix is None:
+            # werkzeug expands defaults (e.g. 'scrypt' -> 'scrypt:32768:8:1'), so read the
+            # canonical prefix off a real hash once.
+            self._method_prefix = self.hash('').split('$', 1)[0]
+        return pwhash.split('$', 1)[0] != self._method_prefix
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown()
+                self._executor = None
+
+
+hasher = PasswordHasher()
+
+def hash_password(password):
+    return hasher.hash(password)
+
+def verify_password(pwhash, password):
+    return hasher.verify(pwhash, password)
+
+def needs_rehash(pwhash):
+    return hasher.needs_rehash(pwhash)
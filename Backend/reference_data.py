@@ -0,0 +1,65 @@
+import logging
+import threading
+
+from .database import db
+from . import versions
+
+
+class ReferenceData:
+    """An in-memory copy of a small, rarely changing collection, keyed by _id.
+
+    The whole collection is loaded once and lookups never touch the database. Writers
+    bump the version counter named after the collection; every process reloads its copy
+    when the version watcher reports a newer counter.
+    """
+
+    def __init__(self, collection_name):
+        self.collection_name = collection_name
+        self._docs = None
+        self._lock = threading.Lock()
+
+    def load(self):
+        docs = {doc['_id']: doc for doc in db[self.collection_name].find()}
+        # Swapping the whole dict keeps readers lock-free.
+        self._docs = docs
+        logging.info(f"ReferenceData: Loaded {len(docs)} document(s) from '{self.collection_name}'.")
+
+    def _ensure_loaded(self):
+        if self._docs is None:
+            with self._lock:
+                if self._docs is None:
+                    self.load()
+        return self._docs
+
+    def get(self, key, default=None):
+        return self._ensure_loaded().get(key, default)
+
+    def all(self):
+        return list(self._ensure_loaded().values())
+
+    def invalidate(self):
+        """Records a change to the collection so that every process reloads it."""
+        versions.bump(self.collection_name)
+
+    def on_version_change(self, name, version):
+        if name == self.collection_name:
+            self.load()
+
+
+_registry = {}
+
+def register(collection_name):
+    """Returns the reference-data cache of a collection, creating it on first use."""
+    if collection_name not in _registry:
+        reference = ReferenceData(collection_name)
+        versions.add_listener(reference.on_version_change)
+        _registry[collection_name] = reference
+    return _registry[collection_name]
+
+def load_all():
+    """Loads every registered collection; called at startup after the database is seeded."""
+    for reference in _registry.values():
+        reference.load()
+
+
+mental_health_resources = register('mental_health_resources')
@@ -0,0 +1,108 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+# Rolling statistics over the last WINDOW_SECONDS of every zone and metric. A window holds
+# at most CAPACITY samples (one per second for 15 minutes by default), so its memory is
+# fixed: two float64 arrays of CAPACITY entries, about 14 KB.
+WINDOW_SECONDS = float(os.getenv('SENSOR_WINDOW_SECONDS', 900))
+WINDOW_CAPACITY = int(os.getenv('SENSOR_WINDOW_CAPACITY', 900))
+MAX_WINDOWS = int(os.getenv('SENSOR_WINDOW_MAX', 4096))
+SYNC_INTERVAL = float(os.getenv('SENSOR_WINDOW_SYNC_SECONDS', 5))
+
+
+class RollingWindow:
+    """A fixed-size ring buffer of (timestamp, value) samples with vectorized statistics."""
+
+    def __init__(self, capacity=WINDOW_CAPACITY):
+        self.capacity = capacity
+        self._timestamps = np.zeros(capacity)
+        self._values = np.zeros(capacity)
+        self._next = 0
+        self._size = 0
+
+    @property
+    def last_timestamp(self):
+        return self._timestamps[self._next - 1] if self._size else None
+
+    def extend(self, timestamps, values):
+        """Appends samples in time order; the oldest ones are overwritten once the buffer is full."""
+        timestamps = np.asarray(timestamps, dtype=np.float64)[-self.capacity:]
+        values = np.asarray(values, dtype=np.float64)[-self.capacity:]
+        count = len(timestamps)
+        if not count:
+            return
+        positions = (self._next + np.arange(count)) % self.capacity
+        self._timestamps[positions] = timestamps
+        self._values[positions] = values
+        self._next = (self._next + count) % self.capacity
+        self._size = min(self._size + count, self.capacity)
+
+    def stats(self, since):
+        """Mean, p95, min, max and trend slope (per minute) of the samples newer than since, or None."""
+        timestamps = self._timestamps[:self._size]
+        values = self._values[:self._size]
+        recent = timestamps >= since
+        timestamps, values = timestamps[recent], values[recent]
+        if not len(values):
+            return None
+        # Least-squares slope; the sample order within the ring does not matter.
+        centered = timestamps - timestamps.mean()
+        variance = np.dot(centered, centered)
+        slope = np.dot(centered, values - values.mean()) / variance * 60 if variance else 0.0
+        return {
+            'samples': int(len(values)),
+            'mean': round(float(values.mean()), 2),
+            'p95': round(float(np.percentile(values, 95)), 2),
+            'min': float(values.min()),
+            'max': float(values.max()),
+            'slope_per_minute': round(float(slope), 3)
+        }
+
+
+class SensorWindows:
+    """One RollingWindow per (zone, metric), kept in step with the stored readings.
+
+    Readings can be ingested by any worker process, so windows do not rely on the local
+    ingest path: at most every sync_interval seconds a window asks
+    loader(zone, metric, after, limit) for the (timestamps, values) stored after its newest
+    sample. Between syncs, queries are answered from memory. The least recently used
+    windows are dropped beyond max_windows.
+    """
+
+    def __init__(self, loader, window_seconds=WINDOW_SECONDS, capacity=WINDOW_CAPACITY,
+                 max_windows=MAX_WINDOWS, sync_interval=SYNC_INTERVAL):
+        self.loader = loader
+        self.window_seconds = window_seconds
+        self.capacity = capacity
+        self.max_windows = max_windows
+        self.sync_interval = sync_interval
+        self._windows = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get_entry(self, key):
+        with self._lock:
+            entry = self._windows.get(key)
+            if entry is None:
+                entry = self._windows[key] = {'window': RollingWindow(self.capacity), 'synced_at': None, 'lock': threading.Lock()}
+                while len(self._windows) > self.max_windows:
+                    self._windows.popitem(last=False)
+            self._windows.move_to_end(key)
+            return entry
+
+    def stats(self, zone, metric, now=None):
+        now = time.time() if now is None else now
+        entry = self._get_entry((zone, metric))
+        window = entry['window']
+        with entry['lock']:
+            if entry['synced_at'] is None or time.monotonic() - entry['synced_at'] >= self.sync_interval:
+                after = window.last_timestamp
+                if after is None:
+                    after = now - self.window_seconds
+                timestamps, values = self.loader(zone, metric, after, self.capacity)
+                window.extend(timestamps, values)
+                entry['synced_at'] = time.monotonic()
+            return window.stats(now - self.window_seconds)
@@ -0,0 +1,110 @@
+import os
+from collections import defaultdict
+from datetime import datetime, timezone
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from .database import db
+
+SENSOR_METRICS = ('co2', 'humidity', 'noise', 'temperature')
+MAX_BATCH_SIZE = int(os.getenv('SENSOR_MAX_BATCH_SIZE', 5000))
+DEFAULT_ZONE = os.getenv('SENSOR_DEFAULT_ZONE', 'office')
+
+# Downsampled series: collection -> bucket width in seconds.
+ROLLUPS = {
+    'sensor_rollups_1m': 60,
+    'sensor_rollups_1h': 3600,
+}
+
+def _parse_timestamp(value):
+    if value is None:
+        return datetime.now(timezone.utc)
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return datetime.fromtimestamp(value, timezone.utc)
+    # The 'Z' in javascript's toISOString isn't always parsed correctly, so we replace it.
+    moment = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+    return moment if moment.tzinfo else moment.replace(tzinfo=timezone.utc)
+
+def parse_readings(items):
+    """Validates raw readings. Returns (readings, errors); errors carry the index of the bad item."""
+    readings, errors = [], []
+    for index, item in enumerate(items):
+        if not isinstance(item, dict):
+            errors.append({'index': index, 'error': 'Reading must be an object'})
+            continue
+        zone, metric, value = item.get('zone'), item.get('metric'), item.get('value')
+        if not isinstance(zone, str) or not zone:
+            errors.append({'index': index, 'error': 'Missing zone'})
+        elif metric not in SENSOR_METRICS:
+            errors.append({'index': index, 'error': f"metric must be one of {', '.join(SENSOR_METRICS)}"})
+        elif not isinstance(value, (int, float)) or isinstance(value, bool):
+            errors.append({'index': index, 'error': 'value must be a number'})
+        else:
+            try:
+                ts = _parse_timestamp(item.get('ts'))
+            except (TypeError, ValueError, OverflowError, OSError):
+                errors.append({'index': index, 'error': 'Invalid ts'})
+                continue
+            readings.append({'ts': ts, 'meta': {'zone': zone, 'metric': metric}, 'value': float(value)})
+    return readings, errors
+
+def _bucket_start(ts, width):
+    return datetime.fromtimestamp(int(ts.timestamp()) // width * width, timezone.utc)
+
+def ingest_readings(readings):
+    """Stores a batch of parsed readings: one insert_many plus one bulk_write per derived collection."""
+    if not readings:
+        return
+    db.sensor_readings.insert_many(readings, ordered=False)
+
+    for collection_name, width in ROLLUPS.items():
+        buckets = defaultdict(list)
+        for reading in readings:
+            meta = reading['meta']
+            buckets[(meta['zone'], meta['metric'], _bucket_start(reading['ts'], width))].append(reading['value'])
+        db[collection_name].bulk_write([
+            UpdateOne(
+                {'zone': zone, 'metric': metric, 'bucket': bucket},
+                {'$inc': {'count': len(values), 'sum': sum(values)},
+                 '$min': {'min': min(values)}, '$max': {'max': max(values)}},
+                upsert=True
+            )
+            for (zone, metric, bucket), values in buckets.items()
+        ], ordered=False)
+
+    latest = {}
+    for reading in readings:
+        key = (reading['meta']['zone'], reading['meta']['metric'])
+        if key not in latest or reading['ts'] >= latest[key]['ts']:
+            latest[key] = reading
+    try:
+        db.sensor_latest.bulk_write([
+            # Only replaces a value with a newer one, so late batches cannot roll it back.
+            UpdateOne(
+                {'_id': zone, '$or': [{f'{metric}.ts': {'$lt': reading['ts']}}, {f'{metric}.ts': {'$exists': False}}]},
+                {'$set': {metric: {'value': reading['value'], 'ts': reading['ts']}}},
+                upsert=True
+            )
+            for (zone, metric), reading in latest.items()
+        ], ordered=False)
+    except BulkWriteError as e:
+        # The zone document already holds a newer value: the upsert collides on _id.
+        if any(error.get('code') != 11000 for error in e.details.get('writeErrors', [])):
+            raise
+
+def latest_values(zone):
+    """The newest reading of every metric in a zone, as {metric: {'value', 'ts'}}."""
+    doc = db.sensor_latest.find_one({'_id': zone}) or {}
+    return {metric: doc[metric] for metric in SENSOR_METRICS if metric in doc}
+
+def readings_after(zone, metric, after, limit):
+    """The latest (at most limit) readings of a zone and metric newer than the epoch time after,
+    as (timestamps, values) in time order."""
+    readings = list(db.sensor_readings.find(
+        {'meta.zone': zone, 'meta.metric': metric, 'ts': {'$gt': datetime.fromtimestamp(after, timezone.utc)}},
+        {'_id': 0, 'ts': 1, 'value': 1}
+    ).sort('ts', -1).limit(limit))
+    readings.reverse()
+    # Stored times come back as naive UTC.
+    return ([reading['ts'].replace(tzinfo=timezone.utc).timestamp() for reading in readings],
+            [reading['value'] for reading in readings])
@@ -0,0 +1,101 @@
+from flask import Response, current_app, jsonify, request, stream_with_context
+import base64
+import binascii
+import json
+import os
+from bson import json_util
+
+# List endpoints return pages of {"items": [...], "next_after": token or null}. Pass the
+# token back as ?after= for the next page; ?limit= sets the page size.
+DEFAULT_PAGE_LIMIT = int(os.getenv('LIST_PAGE_LIMIT', 100))
+MAX_PAGE_LIMIT = int(os.getenv('LIST_PAGE_MAX_LIMIT', 1000))
+# Documents handed to a stream_page transform at a time.
+TRANSFORM_BATCH_SIZE = 100
+
+def encode_after(values):
+    """Turns the sort key values of the last item into an opaque, URL-safe token."""
+    return base64.urlsafe_b64encode(json_util.dumps(values).encode()).decode().rstrip('=')
+
+def decode_after(token):
+    padded = token + '=' * (-len(token) % 4)
+    values = json_util.loads(base64.urlsafe_b64decode(padded.encode()))
+    if not isinstance(values, list):
+        raise ValueError('Malformed page token')
+    return values
+
+def _get_path(doc, path):
+    for part in path.split('.'):
+        doc = doc.get(part) if isinstance(doc, dict) else None
+    return doc
+
+def keyset_filter(sort, after_values):
+    """Matches the documents that come after the given sort key values in the given sort order."""
+    branches = []
+    for position, (field, direction) in enumerate(sort):
+        branch = {previous: after_values[index] for index, (previous, _) in enumerate(sort[:position])}
+        branch[field] = {'$gt' if direction == 1 else '$lt': after_values[position]}
+        branches.append(branch)
+    return branches[0] if len(branches) == 1 else {'$or': branches}
+
+def stream_page(collection, query, sort, projection=None, serialize=None, transform=None):
+    """Streams one keyset page of a query as {"items": [...], "next_after": ...}.
+
+    sort is a list of (field, direction) pairs that must end in a unique field, so that
+    the keys of the last document define where the next page starts. Items are serialized
+    and sent one at a time as the cursor yields them, so memory stays flat however large
+    the page is. transform, if given, turns each batch of documents into the items to send
+    (e.g. joining other collections); it may drop documents, so a page can then hold fewer
+    than limit items before the last one. Returns a 400 response for an invalid ?after=
+    or ?limit=.
+    """
+    limit = request.args.get('limit', DEFAULT_PAGE_LIMIT, type=int)
+    if not (1 <= limit <= MAX_PAGE_LIMIT):
+        return jsonify({'error': f'limit must be between 1 and {MAX_PAGE_LIMIT}.'}), 400
+    after = request.args.get('after')
+    if after:
+        try:
+            after_values = decode_after(after)
+        except (ValueError, TypeError, binascii.Error):
+            return jsonify({'error': 'Invalid after token.'}), 400
+        if len(after_values) != len(sort):
+            return jsonify({'error': 'Invalid after token.'}), 400
+        query = {'$and': [query, keyset_filter(sort, after_values)]}
+
+    if projection and any(projection.values()):
+        # An inclusion projection must also return the sort keys for the page token.
+        projection = {**projection, **{field: 1 for field, _ in sort}}
+    serialize = serialize or current_app.json.dumps
+    # One extra document tells whether there is a next page.
+    cursor = collection.find(query, projection).sort(sort).limit(limit + 1)
+
+    batch_size = TRANSFORM_BATCH_SIZE if transform else 1
+    transform = transform or (lambda docs: docs)
+    sent = 0
+
+    def send(batch):
+        nonlocal sent
+        chunks = []
+        for item in transform(batch):
+            chunks.append((',' if sent else '') + serialize(item))
+            sent += 1
+        return ''.join(chunks)
+
+    def generate():
+        yield '{"items": ['
+        next_after, batch = None, []
+        for count, doc in enumerate(cursor):
+            if count == limit:
+                next_after = encode_after(last_keys)
+                break
+            # Read the keys before transform gets to reshape the document.
+            last_keys = [_get_path(doc, field) for field, _ in sort]
+            batch.append(doc)
+            if len(batch) == batch_size:
+                yield send(batch)
+                batch = []
+        if batch:
+            yield send(batch)
+        cursor.close()
+        yield '], "next_after": ' + json.dumps(next_after) + '}'
+
+    return Response(stream_with_context(generate()), mimetype='application/json')
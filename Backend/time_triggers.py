@@ -0,0 +1,159 @@
+import heapq
+import logging
+import os
+import threading
+from datetime import datetime, timedelta, time as dt_time
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from .database import db
+from . import versions
+
+WEEKDAYS = ('mon', 'tue', 'wed', 'thu', 'fri', 'sat', 'sun')
+
+def _system_timezone():
+    """The IANA name of the server's timezone (from TZ or /etc/localtime), or None."""
+    name = os.getenv('TZ', '').lstrip(':')
+    if not name:
+        try:
+            target = os.path.realpath('/etc/localtime')
+            if '/zoneinfo/' in target:
+                name = target.split('/zoneinfo/', 1)[1]
+            else:
+                with open('/etc/timezone') as f:
+                    name = f.read().strip()
+        except OSError:
+            return None
+    try:
+        ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError):
+        return None
+    return name
+
+# Timezone for time rules that do not name one: a named zone, so that fire times follow
+# daylight saving changes. Defaults to the server's zone, or UTC if it cannot be resolved.
+DEFAULT_TIMEZONE = os.getenv('AUTOMATION_TIMEZONE') or _system_timezone()
+if DEFAULT_TIMEZONE is None:
+    logging.warning("TimeTriggers: Could not resolve the server's timezone; set AUTOMATION_TIMEZONE. Using UTC.")
+    DEFAULT_TIMEZONE = 'UTC'
+
+def _parse_time(value):
+    hour, minute = str(value).split(':')
+    return dt_time(int(hour), int(minute))
+
+def _timezone(condition):
+    return ZoneInfo(condition.get('timezone') or DEFAULT_TIMEZONE)
+
+def _weekday_mask(condition):
+    """The allowed weekdays (0 = Monday) from 'weekdays', given as names or numbers."""
+    weekdays = condition.get('weekdays')
+    if not weekdays:
+        return set(range(7))
+    return {WEEKDAYS.index(day[:3].lower()) if isinstance(day, str) else int(day) for day in weekdays}
+
+def validate_time_condition(condition):
+    """Returns an error message if a 'time' trigger condition cannot be scheduled, else None."""
+    if not isinstance(condition, dict):
+        return "Time triggers need a condition object, e.g. {'time': '08:00'}."
+    try:
+        _parse_time(condition.get('time'))
+    except (ValueError, TypeError):
+        return "Time triggers need a 'time' condition in HH:MM format."
+    try:
+        _timezone(condition)
+    except (ZoneInfoNotFoundError, ValueError, TypeError):
+        return f"Unknown timezone '{condition.get('timezone')}'."
+    try:
+        mask = _weekday_mask(condition)
+    except (ValueError, TypeError):
+        return f"Invalid weekdays. Use names ({', '.join(WEEKDAYS)}) or numbers 0-6 (Monday = 0)."
+    if not mask <= set(range(7)):
+        return "Invalid weekdays. Weekday numbers run from 0 (Monday) to 6 (Sunday)."
+    return None
+
+def next_fire_time(condition, after):
+    """The first instant after 'after' (an aware datetime) at which a time condition fires."""
+    at = _parse_time(condition['time'])
+    tz = _timezone(condition)
+    mask = _weekday_mask(condition)
+    day = after.astimezone(tz).date()
+    for offset in range(8):
+        candidate_day = day + timedelta(days=offset)
+        if candidate_day.weekday() not in mask:
+            continue
+        candidate = datetime.combine(candidate_day, at, tzinfo=tz)
+        if candidate > after:
+            return candidate
+    return None
+
+
+class TimeTriggerPlanner:
+    """Fires time-triggered rules at their exact instants instead of polling every minute.
+
+    The next fire time of every active time rule is kept in a min-heap, and only the
+    earliest one is scheduled as a one-off APScheduler job. When it fires, the due rules
+    are executed and rescheduled. The plan is rebuilt whenever the rules change (in any
+    process, through the 'automation_rules' version counter).
+    """
+
+    JOB_ID = 'time-trigger-planner'
+
+    def __init__(self, scheduler, execute, should_run=lambda: True):
+        self.scheduler = scheduler
+        self.execute = execute
+        self.should_run = should_run
+        self._heap = []
+        self._lock = threading.Lock()
+
+    def start(self):
+        versions.add_listener(self._on_version_change)
+        self.replan()
+
+    def _on_version_change(self, name, version):
+        if name == 'automation_rules':
+            self.replan()
+
+    def replan(self):
+        now = datetime.now().astimezone()
+        heap = []
+        for rule in db.automation_rules.find({'trigger.type': 'time', 'active': True}, {'_id': 0}):
+            condition = rule.get('trigger', {}).get('condition') or {}
+            if validate_time_condition(condition):
+                logging.warning(f"Automation: Time rule #{rule['id']} has an invalid condition {condition}, skipped.")
+                continue
+            fire_at = next_fire_time(condition, now)
+            if fire_at:
+                heap.append((fire_at, rule['id'], rule))
+        heapq.heapify(heap)
+        with self._lock:
+            self._heap = heap
+            self._schedule_next()
+        logging.info(f"Automation: Planned {len(heap)} time rule(s).")
+
+    def _schedule_next(self):
+        if not self._heap:
+            if self.scheduler.get_job(self.JOB_ID):
+                self.scheduler.remove_job(self.JOB_ID)
+            return
+        self.scheduler.add_job(
+            self._fire, 'date', run_date=self._heap[0][0], id=self.JOB_ID,
+            replace_existing=True, misfire_grace_time=60
+        )
+
+    def _fire(self):
+        now = datetime.now().astimezone()
+        due = []
+        with self._lock:
+            # Everything due up to a second from now fires together.
+            while self._heap and self._heap[0][0] <= now + timedelta(seconds=1):
+                fire_at, rule_id, rule = heapq.heappop(self._heap)
+                due.append((fire_at, rule))
+                following = next_fire_time(rule['trigger']['condition'], fire_at)
+                if following:
+                    heapq.heappush(self._heap, (following, rule_id, rule))
+            self._schedule_next()
+
+        # Every worker keeps the plan, but only the scheduler leader executes it.
+        if not due or not self.should_run():
+            return
+        for fire_at, rule in due:
+            self.execute('time', [rule], {'time': fire_at.strftime('%H:%M')})
@@ -0,0 +1,94 @@
+import logging
+import os
+import threading
+import time
+from pymongo import ReturnDocument
+from pymongo.errors import OperationFailure, PyMongoError
+
+from .database import db
+
+# Version counters for data that is cached in-process. Every write path bumps the
+# counter of the data it changed in the 'versions' collection; each process keeps a
+# local mirror of all counters that is updated immediately for its own writes and by
+# a background watcher for writes made by other worker processes.
+POLL_INTERVAL = float(os.getenv('VERSION_POLL_INTERVAL', 2))
+
+_versions = {}
+_listeners = []
+_lock = threading.Lock()
+_watcher = None
+
+def bump(*names):
+    """Increments the version counters of the given names and returns their new values."""
+    new_versions = {}
+    for name in names:
+        doc = db.versions.find_one_and_update(
+            {'_id': name}, {'$inc': {'version': 1}},
+            upsert=True, return_document=ReturnDocument.AFTER
+        )
+        new_versions[name] = doc['version']
+        _observe(name, doc['version'])
+    return new_versions
+
+def current(name):
+    """Returns the locally known version of a name without touching the database."""
+    return _versions.get(name, 0)
+
+def snapshot(*names):
+    return {name: _versions.get(name, 0) for name in names}
+
+def add_listener(callback):
+    """Registers callback(name, version), called whenever a newer version is observed."""
+    _listeners.append(callback)
+
+def _observe(name, version):
+    with _lock:
+        if version <= _versions.get(name, 0):
+            return
+        _versions[name] = version
+    for callback in list(_listeners):
+        try:
+            callback(name, version)
+        except Exception as e:
+            logging.error(f"Versions: Listener failed for '{name}' v{version}: {e}")
+
+def refresh():
+    """Reloads all counters from the database."""
+    for doc in db.versions.find():
+        _observe(doc['_id'], doc.get('version', 0))
+
+def _poll_forever():
+    while True:
+        time.sleep(POLL_INTERVAL)
+        try:
+            refresh()
+        except PyMongoError as e:
+            logging.warning(f"Versions: Polling failed: {e}")
+
+def _watch_forever():
+    while True:
+        try:
+            with db.versions.watch(full_document='updateLookup') as stream:
+                # Catch anything bumped between the initial load and the stream opening.
+                refresh()
+                for change in stream:
+                    doc = change.get('fullDocument')
+                    if doc:
+                        _observe(doc['_id'], doc.get('version', 0))
+        except OperationFailure as e:
+            # Change streams need a replica set; fall back to polling on a standalone server.
+            logging.info(f"Versions: Change streams unavailable ({e}). Polling every {POLL_INTERVAL}s instead.")
+            _poll_forever()
+        except PyMongoError as e:
+            logging.warning(f"Versions: Change stream interrupted: {e}. Reconnecting...")
+            time.sleep(POLL_INTERVAL)
+
+def start_watcher():
+    """Loads the current counters and starts following changes made by other processes."""
+    global _watcher
+    if _watcher:
+        return
+    refresh()
+    _watcher = threading.Thread(target=_watch_forever, name='version-watcher', daemon=True)
+    _watcher.start()
+    logging.info("Versions: Watcher started.")
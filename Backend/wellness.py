@@ -1,12 +1,91 @@
 from flask import Blueprint, request, jsonify, g
+import hmac
+import os
 import random
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
+from functools import wraps
+from pymongo import UpdateOne
 
-from .auth import token_required
+from .auth import token_required, admin_required
 from .database import db
+from .reference_data import mental_health_resources
+from .sensors import DEFAULT_ZONE, MAX_BATCH_SIZE, ROLLUPS, SENSOR_METRICS, ingest_readings, latest_values, parse_readings, readings_after
+from .sensor_windows import SensorWindows
 
 wellness_bp = Blueprint('wellness_bp', __name__)
 
+WELLNESS_METRICS = ('mood', 'energy', 'stress')
+MAX_TREND_WEEKS = 52
+MAX_TREND_MONTHS = 24
+# Shared secret for sensor gateways; without it only administrators can ingest readings.
+SENSOR_API_KEY = os.getenv('SENSOR_API_KEY')
+# CO2 rise (ppm per minute) over the window at which a room should be ventilated.
+CO2_RISING_PER_MINUTE = 10
+
+# Rolling 15-minute statistics per zone and metric, served from memory.
+sensor_windows = SensorWindows(readings_after)
+
+def sensor_key_required(f):
+    """Accepts requests carrying the sensor API key in X-Sensor-Key, otherwise requires an admin token."""
+    admin_view = admin_required(f)
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        key = request.headers.get('X-Sensor-Key')
+        if SENSOR_API_KEY and key and hmac.compare_digest(key, SENSOR_API_KEY):
+            return f(*args, **kwargs)
+        return admin_view(*args, **kwargs)
+    return decorated_function
+
+def _day_key(moment):
+    return moment.strftime('%Y-%m-%d')
+
+def record_rollups(username, values, moment):
+    """Adds one check-in to the user's and the organization's daily rollups.
+
+    Raw check-ins expire after 7 days; the rollups keep count, sum, min and max per
+    metric and day, so trends never have to read the raw collection.
+    """
+    update = {
+        '$inc': {'count': 1, **{f'sum.{metric}': values[metric] for metric in WELLNESS_METRICS}},
+        '$min': {f'min.{metric}': values[metric] for metric in WELLNESS_METRICS},
+        '$max': {f'max.{metric}': values[metric] for metric in WELLNESS_METRICS}
+    }
+    day = _day_key(moment)
+    db.wellness_rollups.bulk_write([
+        UpdateOne({'scope': 'user', 'username': username, 'day': day}, update, upsert=True),
+        UpdateOne({'scope': 'org', 'username': None, 'day': day}, update, upsert=True)
+    ], ordered=False)
+
+def _merge_rollup(period, rollup):
+    period['count'] += rollup['count']
+    for metric in WELLNESS_METRICS:
+        period['sum'][metric] += rollup['sum'][metric]
+        period['min'][metric] = min(period['min'][metric], rollup['min'][metric])
+        period['max'][metric] = max(period['max'][metric], rollup['max'][metric])
+
+def _series(rollups, period_of, periods):
+    """Folds daily rollups into the given periods, oldest first; empty periods have a count of 0."""
+    merged = {}
+    for rollup in rollups:
+        key = period_of(rollup['day'])
+        if key not in merged:
+            merged[key] = {'count': 0, 'sum': dict.fromkeys(WELLNESS_METRICS, 0),
+                           'min': dict(rollup['min']), 'max': dict(rollup['max'])}
+        _merge_rollup(merged[key], rollup)
+
+    series = []
+    for key in periods:
+        period = merged.get(key)
+        point = {'period': key, 'count': period['count'] if period else 0}
+        for metric in WELLNESS_METRICS:
+            point[metric] = {
+                'avg': round(period['sum'][metric] / period['count'], 2),
+                'min': period['min'][metric],
+                'max': period['max'][metric]
+            } if period else None
+        series.append(point)
+    return series
+
 @wellness_bp.route('/api/wellness/checkin', methods=['POST'])
 @token_required
 def checkin():
@@ -19,14 +98,19 @@ def checkin():
     energy = info['energy']
     stress = info['stress']
 
+    if not all(isinstance(info[metric], (int, float)) and not isinstance(info[metric], bool) for metric in WELLNESS_METRICS):
+        return jsonify({'error': 'mood, energy and stress must be numbers'}), 400
+
+    now = datetime.now(timezone.utc)
     record = {
         'username': username,
         'mood': mood,
         'energy': energy,
         'stress': stress,
-        'createdAt': datetime.now(timezone.utc) # Use UTC for consistency and TTL index
+        'createdAt': now # Use UTC for consistency and TTL index
     }
     db.wellness_checkins.insert_one(record)
+    record_rollups(username, record, now)
 
     # Give advice and check for mental health triggers
     advice = []
@@ -43,12 +127,11 @@ def checkin():
         advice.append("Feeling down? Reaching out to a friend or colleague can make a difference.")
         identified_problems.append('sad')
 
-    # If any problems were identified, fetch the corresponding support resources
-    if identified_problems:
-        for problem in identified_problems:
-            resource_doc = db.mental_health_resources.find_one({'_id': problem})
-            if resource_doc and 'resources' in resource_doc:
-                support_resources[problem] = resource_doc['resources']
+    # If any problems were identified, look up the corresponding support resources
+    for problem in identified_problems:
+        resource_doc = mental_health_resources.get(problem)
+        if resource_doc and 'resources' in resource_doc:
+            support_resources[problem] = resource_doc['resources']
 
     return jsonify({
         'message': 'Thank you! Your check-in has been recorded.',
@@ -57,46 +140,164 @@ def checkin():
     })
 
 
+@wellness_bp.route('/api/wellness/trends', methods=['GET'])
+@token_required
+def trends():
+    """Weekly and monthly averages, minimums and maximums for the caller or the whole organization."""
+    scope = request.args.get('scope', 'user')
+    if scope not in ('user', 'org'):
+        return jsonify({'error': "scope must be 'user' or 'org'"}), 400
+    try:
+        weeks = min(max(int(request.args.get('weeks', 12)), 1), MAX_TREND_WEEKS)
+        months = min(max(int(request.args.get('months', 6)), 1), MAX_TREND_MONTHS)
+    except ValueError:
+        return jsonify({'error': 'weeks and months must be integers'}), 400
+
+    today = datetime.now(timezone.utc).date()
+    # Weeks start on Monday; both series end with the current (partial) period.
+    week_starts = [today - timedelta(days=today.weekday(), weeks=offset) for offset in reversed(range(weeks))]
+    month_starts = []
+    year, month = today.year, today.month
+    for _ in range(months):
+        month_starts.insert(0, f"{year:04d}-{month:02d}")
+        year, month = (year - 1, 12) if month == 1 else (year, month - 1)
+    first_day = min(week_starts[0].isoformat(), month_starts[0] + '-01')
+
+    # At most one rollup per day in the window, however many check-ins there were.
+    username = g.current_user['username'] if scope == 'user' else None
+    rollups = list(db.wellness_rollups.find(
+        {'scope': scope, 'username': username, 'day': {'$gte': first_day}}, {'_id': 0}
+    ))
+
+    def week_of(day):
+        date = datetime.strptime(day, '%Y-%m-%d').date()
+        return (date - timedelta(days=date.weekday())).isoformat()
+
+    return jsonify({
+        'scope': scope,
+        'weekly': _series([r for r in rollups if r['day'] >= week_starts[0].isoformat()], week_of,
+                          [start.isoformat() for start in week_starts]),
+        'monthly': _series([r for r in rollups if r['day'] >= month_starts[0]], lambda day: day[:7], month_starts)
+    })
+
+
+@wellness_bp.route('/api/wellness/sensors/readings', methods=['POST'])
+@sensor_key_required
+def ingest_sensor_readings():
+    """Stores a batch of readings: {'readings': [{'zone', 'metric', 'value', 'ts'?}, ...]}."""
+    info = request.get_json(silent=True)
+    items = info.get('readings') if isinstance(info, dict) else None
+    if not isinstance(items, list) or not items:
+        return jsonify({'error': 'readings must be a non-empty list'}), 400
+    if len(items) > MAX_BATCH_SIZE:
+        return jsonify({'error': f'At most {MAX_BATCH_SIZE} readings per batch'}), 413
+
+    readings, errors = parse_readings(items)
+    if not readings:
+        return jsonify({'error': 'No valid readings', 'rejected': errors}), 400
+    ingest_readings(readings)
+    return jsonify({'accepted': len(readings), 'rejected': errors})
+
+
+@wellness_bp.route('/api/wellness/sensors/history', methods=['GET'])
+@token_required
+def sensor_history():
+    """A downsampled series of one metric in one zone, from the 1-minute or 1-hour rollups."""
+    zone = request.args.get('zone', DEFAULT_ZONE)
+    metric = request.args.get('metric', 'co2')
+    resolution = request.args.get('resolution', '1m')
+    collection_name = f'sensor_rollups_{resolution}'
+    if metric not in SENSOR_METRICS or collection_name not in ROLLUPS:
+        return jsonify({'error': f"metric must be one of {', '.join(SENSOR_METRICS)} and resolution 1m or 1h"}), 400
+    try:
+        hours = min(max(int(request.args.get('hours', 24)), 1), 24 * 30)
+    except ValueError:
+        return jsonify({'error': 'hours must be an integer'}), 400
+
+    since = datetime.now(timezone.utc) - timedelta(hours=hours)
+    buckets = db[collection_name].find(
+        {'zone': zone, 'metric': metric, 'bucket': {'$gte': since}}, {'_id': 0}
+    ).sort('bucket', 1)
+    return jsonify({
+        'zone': zone,
+        'metric': metric,
+        'resolution': resolution,
+        'points': [
+            {'ts': bucket['bucket'].isoformat(), 'avg': round(bucket['sum'] / bucket['count'], 2),
+             'min': bucket['min'], 'max': bucket['max'], 'count': bucket['count']}
+            for bucket in buckets
+        ]
+    })
+
+
+def _reading_value(values, metric):
+    return values[metric]['value'] if metric in values else None
+
+def _measured_at(values, *metrics):
+    times = [values[metric]['ts'] for metric in metrics if metric in values]
+    return max(times).isoformat() if times else None
+
+
 @wellness_bp.route('/api/wellness/air-quality', methods=['GET'])
 @token_required
 def air_quality():
-    # Generate random numbers (instead of real sensors)
-    office_state = db.state.find_one({'_id': 'office'}) or {}
-
-    co2 = random.randint(400, 1000)
-    # Get real temperature and humidity from the climate system state
-    temp = office_state.get('temperature', 21)
-    humidity = random.randint(40, 70) # Humidity sensor is not in climate system, so it remains random
+    zone = request.args.get('zone', DEFAULT_ZONE)
+    values = latest_values(zone)
+    co2_window = sensor_windows.stats(zone, 'co2')
+    temp = _reading_value(values, 'temperature')
+    if temp is None:
+        # Fall back to the temperature of the climate system state.
+        office_state = db.state.find_one({'_id': 'office'}) or {}
+        temp = office_state.get('temperature', 21)
 
+    # Classify on the window average, so a single spike does not flip the status.
+    co2_level = co2_window['mean'] if co2_window else _reading_value(values, 'co2')
     status = "Good"
-    if co2 > 800:
+    if co2_level is None:
+        status = "No sensor data"
+    elif co2_level > 800:
         status = "Poor - High CO2 levels"
+    elif co2_window and co2_window['slope_per_minute'] > CO2_RISING_PER_MINUTE:
+        status = "Good - CO2 rising, consider ventilating"
     if temp > 25:
         status = "Too hot"
 
     return jsonify({
-        'co2': co2,
+        'zone': zone,
+        'co2': _reading_value(values, 'co2'),
         'temperature': temp,
-        'humidity': humidity,
-        'status': status
+        'humidity': _reading_value(values, 'humidity'),
+        'status': status,
+        'measured_at': _measured_at(values, 'co2', 'humidity'),
+        'co2_window': co2_window
     })
 
 
 @wellness_bp.route('/api/wellness/noise-levels', methods=['GET'])
 @token_required
 def noise():
-    noise_level = random.randint(30, 80)
+    zone = request.args.get('zone', DEFAULT_ZONE)
+    values = latest_values(zone)
+    noise_window = sensor_windows.stats(zone, 'noise')
+    noise_level = noise_window['mean'] if noise_window else _reading_value(values, 'noise')
 
-    if noise_level < 50:
+    if noise_level is None:
+        status = "No sensor data"
+    elif noise_level < 50:
         status = "Quiet - Good for work"
     elif noise_level < 70:
         status = "Moderate"
     else:
         status = "Too noisy!"
+    if noise_window and noise_level < 70 <= noise_window['p95']:
+        status += " - with loud peaks"
 
     return jsonify({
-        'noise_db': noise_level,
-        'status': status
+        'zone': zone,
+        'noise_db': _reading_value(values, 'noise'),
+        'status': status,
+        'measured_at': _measured_at(values, 'noise'),
+        'noise_window': noise_window
     })
 
 
@@ -152,8 +353,7 @@ def mental_health():
     name = g.current_user['username']
     problem = info.get('problem', 'general')
 
-    # Fetch resources from the database
-    resource_doc = db.mental_health_resources.find_one({'_id': problem})
+    resource_doc = mental_health_resources.get(problem)
 
     if resource_doc and 'resources' in resource_doc:
         help_options = resource_doc['resources']
@@ -169,3 +369,34 @@ def mental_health():
         'help': help_options,
         'emergency': "In emergency call: 100 or 1201"
     })
+
+
+@wellness_bp.route('/api/wellness/mental-health/resources', methods=['GET'])
+@admin_required
+def list_mental_health_resources():
+    return jsonify(sorted(mental_health_resources.all(), key=lambda doc: doc['_id']))
+
+
+@wellness_bp.route('/api/wellness/mental-health/resources/<problem>', methods=['PUT'])
+@admin_required
+def set_mental_health_resources(problem):
+    info = request.get_json()
+    resources = info.get('resources') if info else None
+    if not isinstance(resources, list) or not resources or not all(isinstance(item, str) and item.strip() for item in resources):
+        return jsonify({'error': 'resources must be a non-empty list of strings'}), 400
+
+    db.mental_health_resources.update_one(
+        {'_id': problem}, {'$set': {'resources': [item.strip() for item in resources]}}, upsert=True
+    )
+    mental_health_resources.invalidate()
+    return jsonify({'message': f"Resources for '{problem}' updated."})
+
+
+@wellness_bp.route('/api/wellness/mental-health/resources/<problem>', methods=['DELETE'])
+@admin_required
+def delete_mental_health_resources(problem):
+    result = db.mental_health_resources.delete_one({'_id': problem})
+    if result.deleted_count == 0:
+        return jsonify({'error': f"No resources found for '{problem}'."}), 404
+    mental_health_resources.invalidate()
+    return jsonify({'message': f"Resources for '{problem}' deleted."})
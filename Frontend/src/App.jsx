@@ -25,6 +25,142 @@ const authenticatedFetch = async (url, options = {}) => {
     return fetch(url, { ...options, headers });
 };
 
+// List endpoints return pages of { items, next_after }; follow them to collect every item.
+const fetchAllPages = async (url) => {
+    const items = [];
+    let after = null;
+    do {
+        const separator = url.includes('?') ? '&' : '?';
+        const response = await authenticatedFetch(after ? `${url}${separator}after=${encodeURIComponent(after)}` : url);
+        if (!response.ok) throw new Error(`Request failed with status ${response.status}`);
+        const page = await response.json();
+        items.push(...page.items);
+        after = page.next_after;
+    } while (after);
+    return items;
+};
+
+// --- Live Updates ---
+// The backend pushes climate, parking and room snapshots over Server-Sent Events.
+// Each snapshot is re-dispatched as a 'live-update' window event, with the version of
+// the data when the backend sends one (the event id, or the X-Versions header when
+// polling). If the stream cannot be opened, the same topics are polled until it reconnects.
+const LIVE_TOPIC_ENDPOINTS = {
+    climate: '/api/climate/status',
+    parking: '/api/parking/all-spots',
+    rooms: '/api/rooms/status',
+};
+// The backend version counter behind each topic.
+const LIVE_TOPIC_VERSIONS = {
+    climate: 'state',
+    parking: 'parking',
+    rooms: 'rooms',
+};
+const FALLBACK_POLL_MS = 30000;
+
+const emitLiveUpdate = (topic, data, version) => {
+    window.dispatchEvent(new CustomEvent('live-update', { detail: { topic, data, version } }));
+};
+
+// Reads one counter from an X-Versions header ("name=value, ...").
+const versionFromHeaders = (response, name) => {
+    for (const entry of (response.headers.get('X-Versions') || '').split(',')) {
+        const [key, value] = entry.trim().split('=');
+        if (key === name) return value;
+    }
+    return undefined;
+};
+
+const startLiveUpdates = () => {
+    let stopped = false;
+    let controller = null;
+    let pollTimer = null;
+    let retryDelay = 1000;
+
+    const poll = async () => {
+        await Promise.all(Object.entries(LIVE_TOPIC_ENDPOINTS).map(async ([topic, url]) => {
+            try {
+                const response = await authenticatedFetch(url);
+                if (response.ok) {
+                    emitLiveUpdate(topic, await response.json(), versionFromHeaders(response, LIVE_TOPIC_VERSIONS[topic]));
+                }
+            } catch (e) {
+                console.error(`Polling ${topic} failed:`, e);
+            }
+        }));
+    };
+    const startPolling = () => {
+        if (pollTimer) return;
+        poll();
+        pollTimer = setInterval(poll, FALLBACK_POLL_MS);
+    };
+    const stopPolling = () => {
+        clearInterval(pollTimer);
+        pollTimer = null;
+    };
+
+    const connect = async () => {
+        if (stopped) return;
+        controller = new AbortController();
+        try {
+            // fetch is used instead of EventSource so the token can go in the Authorization header.
+            const response = await authenticatedFetch('/api/live/stream', { signal: controller.signal });
+            if (!response.ok || !response.body) throw new Error(`HTTP error! status: ${response.status}`);
+            stopPolling();
+            retryDelay = 1000;
+            const reader = response.body.getReader();
+            const decoder = new TextDecoder();
+            let buffer = '';
+            while (true) {
+                const { value, done } = await reader.read();
+                if (done) break;
+                buffer += decoder.decode(value, { stream: true });
+                let boundary;
+                while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+                    const message = buffer.slice(0, boundary);
+                    buffer = buffer.slice(boundary + 2);
+                    let topic = 'message';
+                    let data = '';
+                    let version;
+                    for (const line of message.split('\n')) {
+                        if (line.startsWith('event:')) topic = line.slice(6).trim();
+                        else if (line.startsWith('data:')) data += line.slice(5).trim();
+                        else if (line.startsWith('id:')) version = line.slice(3).trim();
+                    }
+                    if (data) emitLiveUpdate(topic, JSON.parse(data), version);
+                }
+            }
+        } catch (e) {
+            if (stopped) return;
+            console.warn(`Live updates unavailable (${e.message}), falling back to polling.`);
+        }
+        if (stopped) return;
+        startPolling();
+        setTimeout(connect, retryDelay);
+        retryDelay = Math.min(retryDelay * 2, 60000);
+    };
+
+    connect();
+    return () => {
+        stopped = true;
+        if (controller) controller.abort();
+        stopPolling();
+    };
+};
+
+// Calls onData(data, version) with every snapshot pushed for a topic.
+const useLiveTopic = (topic, onData) => {
+    const handlerRef = React.useRef(onData);
+    handlerRef.current = onData;
+    React.useEffect(() => {
+        const listener = (e) => {
+            if (e.detail.topic === topic) handlerRef.current(e.detail.data, e.detail.version);
+        };
+        window.addEventListener('live-update', listener);
+        return () => window.removeEventListener('live-update', listener);
+    }, [topic]);
+};
+
 // --- Login Panel Component ---
 const LoginPanel = ({ onLoginSuccess }) => {
     const [username, setUsername] = React.useState('');
@@ -107,9 +243,17 @@ const ClimatePanel = ({ currentUser }) => {
 
     React.useEffect(() => {
         fetchStatus();
-        // Polling removed to rely on action-based updates.
+        // Further updates are pushed by the live stream.
     }, []);
 
+    useLiveTopic('climate', (data) => {
+        setStatus(data);
+        if (document.activeElement.id !== 'temp-input') {
+            setTempInput(data.temperature);
+        }
+        setLoading(false);
+    });
+
     const sendControlCommand = async (action, value) => {
         setError(null);
         try {
@@ -254,6 +398,8 @@ const ParkingPanel = ({ currentUser }) => {
         fetchParkingData();
     }, []);
 
+    useLiveTopic('parking', setSpots);
+
     const handleReserveSpot = async () => {
         if (!selectedSpot) return setError("A spot must be selected to reserve.");
 
@@ -353,6 +499,10 @@ const ParkingPanel = ({ currentUser }) => {
             spotClass = `border-red-500/50 bg-red-900/40 ${spot.user === currentUser.username ? 'ring-2 ring-fuchsia-400 shadow-[0_0_10px_#d946ef]' : ''}`;
             icon = '🚗';
             textClass = 'text-red-300';
+        } else if (spot.status === 'blocked') {
+            spotClass = 'border-gray-500/50 bg-gray-800/60';
+            icon = '⛔';
+            textClass = 'text-gray-400';
         }
 
         if (selectedSpot && selectedSpot.id === spot.id) {
@@ -369,7 +519,7 @@ const ParkingPanel = ({ currentUser }) => {
                 {spot.user && (
                     <div className="text-xs text-gray-400 truncate w-full px-1">{spot.user}</div>
                 )}
-                {(spot.status === 'occupied' || spot.status === 'reserved') && currentUser.role === 'admin' && (
+                {(spot.status === 'occupied' || spot.status === 'reserved' || spot.status === 'blocked') && currentUser.role === 'admin' && (
                     <button onClick={(e) => { e.stopPropagation(); handleClearSpot(spot.id); }} className="absolute bottom-1 right-1 bg-red-600/80 hover:bg-red-500 text-white text-xs font-bold px-2 py-0.5 rounded opacity-0 group-hover:opacity-100 transition-opacity">
                         Clear
                     </button>
@@ -444,15 +594,13 @@ const AutomationPanel = ({ currentUser }) => {
 
     const fetchData = async () => {
         try {
-            const [rulesRes, savingsRes] = await Promise.all([
-                authenticatedFetch('/api/automation/rules'),
+            const [rulesData, savingsRes] = await Promise.all([
+                fetchAllPages('/api/automation/rules').catch(() => { throw new Error('Failed to fetch automation rules'); }),
                 authenticatedFetch('/api/automation/energy-savings')
             ]);
 
-            if (!rulesRes.ok) throw new Error('Failed to fetch automation rules');
             if (!savingsRes.ok) throw new Error('Failed to fetch energy savings');
 
-            const rulesData = await rulesRes.json();
             const savingsData = await savingsRes.json();
 
             setRules(rulesData);
@@ -575,11 +723,7 @@ const CreateRuleForm = ({ currentUser, onRuleCreated }) => {
         // Fetch users for the user_login condition dropdown
         const fetchUsers = async () => {
             try {
-                const response = await authenticatedFetch('/api/users/all');
-                if (response.ok) {
-                    const data = await response.json();
-                    setAllUsers(data);
-                }
+                setAllUsers(await fetchAllPages('/api/users/all'));
             } catch (e) { console.error("Failed to fetch users for automation form", e); }
         };
         fetchUsers();
@@ -714,9 +858,7 @@ const UsersPanel = ({ currentUser }) => {
 
     const fetchUsers = async () => {
         try {
-            const response = await authenticatedFetch('/api/users/all');
-            if (!response.ok) throw new Error('Failed to fetch users.');
-            const data = await response.json();
+            const data = await fetchAllPages('/api/users/all').catch(() => { throw new Error('Failed to fetch users.'); });
             setUsers(data);
         } catch (e) {
             setError(e.message);
@@ -872,6 +1014,8 @@ const MeetingRoomsPanel = ({ currentUser }) => {
     const [error, setError] = React.useState(null);
     const [message, setMessage] = React.useState(null);
     const [currentWeekStart, setCurrentWeekStart] = React.useState(getStartOfWeek(new Date()));
+    // Rooms version of the last live push that refreshed the calendar.
+    const roomsVersionRef = React.useRef(null);
 
     // Booking form state
     const [bookingRoomId, setBookingRoomId] = React.useState('');
@@ -885,16 +1029,15 @@ const MeetingRoomsPanel = ({ currentUser }) => {
         try {
             const weekStartISO = new Date(currentWeekStart.setHours(0, 0, 0, 0)).toISOString();
 
-            const [roomsRes, bookingsRes] = await Promise.all([
+            const [roomsRes, bookingsData] = await Promise.all([
                 authenticatedFetch('/api/rooms/status'),
-                authenticatedFetch(`/api/rooms/bookings-for-week?start_date=${weekStartISO}`)
+                fetchAllPages(`/api/rooms/bookings-for-week?start_date=${weekStartISO}`)
+                    .catch(() => { throw new Error('Failed to fetch weekly bookings'); })
             ]);
 
             if (!roomsRes.ok) throw new Error('Failed to fetch room status');
-            if (!bookingsRes.ok) throw new Error('Failed to fetch weekly bookings');
 
             const roomsData = await roomsRes.json();
-            const bookingsData = await bookingsRes.json();
 
             // Set default room for booking form if not set
             if (!bookingRoomId && roomsData.length > 0) {
@@ -914,6 +1057,21 @@ const MeetingRoomsPanel = ({ currentUser }) => {
         fetchData();
     }, [currentWeekStart]);
 
+    useLiveTopic('rooms', async (roomsData, version) => {
+        setRooms(roomsData);
+        // Bookings made by others change the calendar too; refresh it quietly. Room status
+        // is also re-pushed every minute as bookings start and end; those pushes keep the
+        // same version and leave the calendar alone.
+        if (version !== undefined && version === roomsVersionRef.current) return;
+        roomsVersionRef.current = version;
+        try {
+            const weekStartISO = new Date(new Date(currentWeekStart).setHours(0, 0, 0, 0)).toISOString();
+            setBookings(await fetchAllPages(`/api/rooms/bookings-for-week?start_date=${weekStartISO}`));
+        } catch (e) {
+            console.error("Failed to refresh weekly bookings:", e);
+        }
+    });
+
     const handleApiCall = async (method, endpoint, body, successMessage) => {
         let responseData;
         try {
@@ -1274,17 +1432,14 @@ const StatusLine = () => {
 
     const fetchData = async () => {
         try {
-            const [climateRes, parkingRes, roomsRes] = await Promise.all([
-                authenticatedFetch('/api/climate/status'),
-                authenticatedFetch('/api/parking/all-spots'),
-                authenticatedFetch('/api/rooms/status')
-            ]);
-            const climateData = climateRes.ok ? await climateRes.json() : null;
-            const parkingData = parkingRes.ok ? await parkingRes.json() : [];
-            const roomsData = roomsRes.ok ? await roomsRes.json() : [];
-            setClimateStatus(climateData);
-            setParkingSpots(parkingData);
-            setRooms(roomsData);
+            // One composite call; the browser revalidates it with its ETag, so an unchanged
+            // dashboard comes back as 304 and is served from the HTTP cache.
+            const response = await authenticatedFetch('/api/dashboard');
+            if (!response.ok) throw new Error(`HTTP error! status: ${response.status}`);
+            const data = await response.json();
+            setClimateStatus(data.climate);
+            setParkingSpots(data.parking);
+            setRooms(data.rooms);
         } catch (e) {
             console.error("Status line fetch error:", e);
         } finally {
@@ -1298,6 +1453,10 @@ const StatusLine = () => {
         return () => window.removeEventListener('app-state-changed', fetchData);
     }, []);
 
+    useLiveTopic('climate', setClimateStatus);
+    useLiveTopic('parking', setParkingSpots);
+    useLiveTopic('rooms', setRooms);
+
     const availableSpots = parkingSpots.filter(s => s.status === 'available').length;
     const availableRooms = rooms.filter(r => r.status === 'available').length;
 
@@ -1345,6 +1504,11 @@ const App = () => {
         return () => clearTimeout(timer);
     }, []); // The empty dependency array ensures this runs only once
 
+    React.useEffect(() => {
+        if (!isLoggedIn) return;
+        return startLiveUpdates();
+    }, [isLoggedIn]);
+
     React.useEffect(() => {
         const healthCheck = () => {
             fetch('/health').catch(err => console.error("Health check failed:", err));
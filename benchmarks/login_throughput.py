@@ -0,0 +1,58 @@
+"""Login throughput of the password hashing pool.
+
+Simulates the morning login spike: many request threads verifying passwords at once,
+for several hashing pool sizes. Reports logins/sec and latency percentiles.
+
+    python -m benchmarks.login_throughput [--logins 200] [--clients 32] [--pools 1,2,4,8]
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from Backend.passwords import HASH_METHOD, PasswordHasher
+
+
+def run(pool_size, logins, clients, method):
+    hasher = PasswordHasher(method=method, workers=pool_size)
+    pwhash = hasher.hash('correct horse battery staple')  # also warms up the pool
+    latencies = []
+
+    def login():
+        start = time.perf_counter()
+        assert hasher.verify(pwhash, 'correct horse battery staple')
+        latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as request_threads:
+        for _ in range(logins):
+            request_threads.submit(login)
+    elapsed = time.perf_counter() - start
+    hasher.shutdown()
+
+    latencies.sort()
+    p50 = latencies[len(latencies) // 2] * 1000
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000
+    return logins / elapsed, p50, p99
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--logins', type=int, default=200)
+    parser.add_argument('--clients', type=int, default=32)
+    parser.add_argument('--pools', default='1,2,4,8')
+    parser.add_argument('--method', default=HASH_METHOD)
+    args = parser.parse_args()
+
+    print(f"method={args.method} logins={args.logins} clients={args.clients} cpus={os.cpu_count()}")
+    print(f"{'pool':>6} {'logins/s':>10} {'p50 ms':>10} {'p99 ms':>10}")
+    for pool_size in [int(p) for p in args.pools.split(',')]:
+        rate, p50, p99 = run(pool_size, args.logins, args.clients, args.method)
+        print(f"{pool_size:>6} {rate:>10.1f} {p50:>10.1f} {p99:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
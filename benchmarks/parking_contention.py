@@ -0,0 +1,101 @@
+"""Parking reservation under contention.
+
+Hundreds of clients race for the last few free spots of a lot, once with the former
+read-check-write reservation path and once with the atomic claim. Reports reservation
+attempts per second and the double-booking count (reservations beyond the first per spot),
+which must be zero for the atomic path.
+
+Needs MONGO_URI; runs in a scratch database (office_app_benchmark by default) that it
+empties first.
+
+    python -m benchmarks.parking_contention [--clients 200] [--attempts 5] [--spots 1000] [--free 10]
+"""
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dotenv import load_dotenv
+load_dotenv()
+
+from Backend import parking
+from Backend.database import client
+
+
+def legacy_reserve(spot_id, name):
+    """The reservation path before the atomic claim: find, check, update, insert."""
+    spot = parking.db.parking_spots.find_one({'id': spot_id})
+    if not spot:
+        return 'missing'
+    if not spot['is_available']:
+        return 'unavailable'
+    parking.db.parking_spots.update_one({'id': spot_id}, {'$set': {'is_available': False}})
+    parking.db.reservations.insert_one({'id': spot_id, 'name': name})
+    return 'reserved'
+
+
+def reset_lot(db, spots, free):
+    db.parking_spots.drop()
+    db.reservations.drop()
+    db.parking_spots.create_index('id', unique=True)
+    db.reservations.create_index('id')
+    free_ids = set(random.sample(range(1, spots + 1), free))
+    db.parking_spots.insert_many([{'id': i, 'is_available': i in free_ids} for i in range(1, spots + 1)])
+    return sorted(free_ids)
+
+
+def double_bookings(db):
+    counts = db.reservations.aggregate([
+        {'$group': {'_id': '$id', 'count': {'$sum': 1}}},
+        {'$match': {'count': {'$gt': 1}}}
+    ])
+    return sum(doc['count'] - 1 for doc in counts)
+
+
+def run(reserve, db, clients, attempts, spots, free):
+    free_ids = reset_lot(db, spots, free)
+    start_line = threading.Barrier(clients)
+    reserved = []
+
+    def client_loop(client_id):
+        start_line.wait()
+        for _ in range(attempts):
+            if reserve(random.choice(free_ids), f'user{client_id}') == 'reserved':
+                reserved.append(client_id)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        for client_id in range(clients):
+            pool.submit(client_loop, client_id)
+    elapsed = time.perf_counter() - start
+    return clients * attempts / elapsed, len(reserved), double_bookings(db)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--clients', type=int, default=200)
+    parser.add_argument('--attempts', type=int, default=5)
+    parser.add_argument('--spots', type=int, default=1000)
+    parser.add_argument('--free', type=int, default=10)
+    parser.add_argument('--database', default='office_app_benchmark')
+    args = parser.parse_args()
+    if args.database == parking.db.name:
+        sys.exit("Refusing to run against the application database.")
+
+    # Both reservation paths read the module's database handle.
+    parking.db = client[args.database]
+    print(f"clients={args.clients} attempts={args.attempts} spots={args.spots} free={args.free}")
+    print(f"{'path':>8} {'attempts/s':>11} {'reserved':>9} {'double-booked':>14}")
+    for label, reserve in (('legacy', legacy_reserve), ('atomic', parking.claim_spot)):
+        rate, reserved, doubles = run(reserve, parking.db, args.clients, args.attempts, args.spots, args.free)
+        print(f"{label:>8} {rate:>11.0f} {reserved:>9} {doubles:>14}")
+    client.drop_database(args.database)
+
+
+if __name__ == '__main__':
+    main()
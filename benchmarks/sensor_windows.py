@@ -0,0 +1,81 @@
+"""Query cost of the in-memory rolling sensor windows.
+
+Fills one full 15-minute window per zone and metric (no database involved: the loader
+returns nothing after the initial fill), then times stats() queries over random zones,
+the work behind every air-quality and noise dashboard hit. Also reports the memory
+held by the windows.
+
+    python -m benchmarks.sensor_windows [--zones 1000] [--queries 20000]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from Backend.sensor_windows import WINDOW_CAPACITY, WINDOW_SECONDS, SensorWindows
+
+METRICS = ('co2', 'noise')
+
+
+def run(zones, queries, capacity):
+    now = time.time()
+    # One sample per (WINDOW_SECONDS / capacity) seconds, covering the whole window.
+    timestamps = np.linspace(now - WINDOW_SECONDS + 1, now, capacity)
+    rng = np.random.default_rng(0)
+    filled = set()
+
+    def loader(zone, metric, after, limit):
+        if (zone, metric) in filled:
+            return [], []
+        filled.add((zone, metric))
+        return timestamps[-limit:], rng.normal(600, 50, len(timestamps))[-limit:]
+
+    windows = SensorWindows(loader, capacity=capacity, max_windows=zones * len(METRICS), sync_interval=3600)
+    start = time.perf_counter()
+    for zone in range(zones):
+        for metric in METRICS:
+            windows.stats(f'zone-{zone}', metric, now=now)
+    fill_seconds = time.perf_counter() - start
+
+    keys = [(f'zone-{random.randrange(zones)}', random.choice(METRICS)) for _ in range(queries)]
+    latencies = []
+    start = time.perf_counter()
+    for zone, metric in keys:
+        query_start = time.perf_counter()
+        windows.stats(zone, metric, now=now)
+        latencies.append(time.perf_counter() - query_start)
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    memory = zones * len(METRICS) * capacity * 2 * 8
+    return {
+        'fill_seconds': fill_seconds,
+        'queries_per_second': queries / elapsed,
+        'p50_us': latencies[len(latencies) // 2] * 1e6,
+        'p99_us': latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1e6,
+        'all_zones_ms': elapsed / queries * zones * len(METRICS) * 1000,
+        'memory_mb': memory / 2**20
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--zones', type=int, default=1000)
+    parser.add_argument('--queries', type=int, default=20000)
+    parser.add_argument('--capacity', type=int, default=WINDOW_CAPACITY)
+    args = parser.parse_args()
+
+    result = run(args.zones, args.queries, args.capacity)
+    print(f"zones={args.zones} metrics={len(METRICS)} capacity={args.capacity} window={WINDOW_SECONDS:.0f}s")
+    print(f"fill: {result['fill_seconds']:.2f}s, window memory: {result['memory_mb']:.1f} MB")
+    print(f"stats(): {result['queries_per_second']:.0f} queries/s, p50 {result['p50_us']:.0f} us, p99 {result['p99_us']:.0f} us")
+    print(f"one pass over every zone and metric: {result['all_zones_ms']:.0f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,32 @@
+# Gunicorn configuration for the production server: gunicorn -c gunicorn.conf.py wsgi:app
+import multiprocessing
+import os
+import subprocess
+import sys
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5000')}"
+
+# One process per core. Each worker also runs its own password hashing pool
+# (PASSWORD_HASH_WORKERS), so keep workers x hash workers close to the core count.
+workers = int(os.getenv('WEB_CONCURRENCY', multiprocessing.cpu_count()))
+
+# Threaded workers. Every open live event stream (/api/live/stream, one per browser tab)
+# holds a thread for as long as the tab is open, so each worker gets a stream budget
+# (LIVE_STREAMS_PER_WORKER, enforced by Backend/live.py) on top of the threads reserved
+# for regular API requests. Streams therefore never starve logins or other calls; tabs
+# beyond WEB_CONCURRENCY x LIVE_STREAMS_PER_WORKER fall back to polling.
+worker_class = 'gthread'
+live_streams_per_worker = int(os.getenv('LIVE_STREAMS_PER_WORKER', 64))
+api_threads = int(os.getenv('GUNICORN_API_THREADS', 16))
+threads = live_streams_per_worker + api_threads
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 60))
+graceful_timeout = 30
+
+accesslog = '-'
+errorlog = '-'
+
+def on_starting(server):
+    # Seed data and indexes are created once, in a separate process, so the MongoDB
+    # client is not opened in the master before it forks the workers.
+    main_py = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'main.py')
+    subprocess.run([sys.executable, main_py, '--init-db'], check=True)
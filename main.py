@@ -2,17 +2,24 @@ from flask import Flask, jsonify, request
 from flask_cors import CORS
 import logging
 import os
-from werkzeug.security import generate_password_hash
+import sys
 from dotenv import load_dotenv
 from datetime import datetime, timezone
 from apscheduler.schedulers.background import BackgroundScheduler
 from Backend.climate import climate_bp
 from Backend.database import db
-from Backend.parking import parking_bp
-from Backend.automation import automation_bp, process_event
-from Backend.auth import auth_bp
-from Backend.meeting_rooms import meeting_rooms_bp
+from Backend.parking import parking_bp, reconcile_reservation_counts, migrate_parking_lots, reconcile_lot_stats
+from Backend.automation import automation_bp, run_rules
+from Backend.time_triggers import TimeTriggerPlanner
+from Backend.auth import auth_bp, backfill_username_lower
+from Backend.meeting_rooms import meeting_rooms_bp, rebuild_room_slots, release_ended_slots, archive_ended_bookings
 from Backend.wellness import wellness_bp
+from Backend.live import live_bp
+from Backend.dashboard import dashboard_bp
+from Backend import versions, reference_data
+from Backend.indexes import ensure_indexes
+from Backend.passwords import hash_password
+from Backend.leader import LeaderLease
 
 # Load environment variables from .env file.
 load_dotenv()
@@ -35,7 +42,7 @@ def initialize_database():
     # Initialize Parking Spots
     if db.parking_spots.count_documents({}) == 0:
         logging.info("Application: Initializing 20 parking spots...")
-        db.parking_spots.insert_many([{'id': i, 'is_available': True} for i in range(1, 21)])
+        db.parking_spots.insert_many([{'id': i, 'lot': 'main', 'floor': 1, 'is_available': True, 'reservation_count': 0} for i in range(1, 21)])
 
     # Initialize default Automation Rules
     if db.automation_rules.count_documents({}) == 0:
@@ -74,24 +81,30 @@ def initialize_database():
         db.meeting_rooms.insert_many(default_rooms)
         # Bookings collection will be created on first insert.
 
+    # Bookings made before the booking engine existed have no slot documents yet.
+    if db.meeting_room_slots.count_documents({}) == 0 and db.meeting_bookings.count_documents({}) > 0:
+        logging.info("Application: Building meeting room slot documents from existing bookings...")
+        rebuild_room_slots()
+
     # Initialize default Users
     if db.users.count_documents({}) == 0:
         logging.info("Application: Initializing users...")
         users_to_create = [
             # Admins
-            {'username': 'admin1', 'password': generate_password_hash('adminpass1'), 'role': 'admin'},
+            {'username': 'admin1', 'username_lower': 'admin1', 'password': hash_password('adminpass1'), 'role': 'admin'},
             # Users
-            {'username': 'user1', 'password': generate_password_hash('userpass1'), 'role': 'user'}
+            {'username': 'user1', 'username_lower': 'user1', 'password': hash_password('userpass1'), 'role': 'user'}
         ]
         db.users.insert_many(users_to_create)
 
-    # Initialize Wellness Collections
-    # Check if the collection exists before trying to create it
-    if 'wellness_checkins' not in db.list_collection_names():
-        logging.info("Application: Creating 'wellness_checkins' collection with TTL index...")
-        wellness_checkins = db.create_collection('wellness_checkins')
-        # Create a TTL index to automatically delete documents after 7 days (604800 seconds)
-        wellness_checkins.create_index("createdAt", expireAfterSeconds=604800)
+    # Case-insensitive logins look users up by 'username_lower'.
+    backfill_username_lower()
+
+    # Parking violations read the per-spot reservation counts; set them on existing spots.
+    reconcile_reservation_counts()
+    # Spots belong to a lot and floor; the lot summary reads per-lot availability counters.
+    migrate_parking_lots()
+    reconcile_lot_stats()
 
     if db.mental_health_resources.count_documents({}) == 0:
         logging.info("Application: Initializing mental health resources...")
@@ -118,6 +131,11 @@ def initialize_database():
             }
         ]
         db.mental_health_resources.insert_many(default_resources)
+        # Processes that loaded the (then empty) collection before seeding reload it.
+        reference_data.mental_health_resources.invalidate()
+
+    # Create the indexes of every collection (including the wellness check-in TTL index)
+    ensure_indexes()
 
     logging.info("Application: Database initialization check complete.")
 
@@ -141,6 +159,13 @@ def create_app():
     app.register_blueprint(auth_bp)
     app.register_blueprint(meeting_rooms_bp)
     app.register_blueprint(wellness_bp)
+    app.register_blueprint(live_bp)
+    app.register_blueprint(dashboard_bp)
+
+    # Keep in-process caches in step with writes made by other worker processes.
+    versions.start_watcher()
+    # Small static collections (e.g. mental health resources) are served from memory.
+    reference_data.load_all()
 
     # This error handler is the key to integrating the React SPA.
     # If a route is not found by the server (i.e., it's not an API route and not a static file),
@@ -167,31 +192,49 @@ def create_app():
 
     # --- Scheduler Setup ---
     # We define the jobs here so they have access to the 'app' context.
-    def time_trigger_job():
-        """Fires every minute to trigger time-based automations."""
-        with app.app_context():
-            current_time = datetime.now().strftime("%H:%M")
-            process_event('time', {'time': current_time})
-
-    def cleanup_old_bookings_job():
-        """Removes meeting room bookings that have already ended."""
+    # With several worker processes every one of them runs this scheduler, but only the
+    # holder of the 'scheduler' lease executes the jobs.
+    scheduler_lease = LeaderLease('scheduler')
+
+    def archive_bookings_job():
+        """Moves meeting room bookings that have ended into the booking history."""
+        if not scheduler_lease.is_leader():
+            return
         with app.app_context():
             now = datetime.now(timezone.utc)
-            result = db.meeting_bookings.delete_many({'end_time': {'$lt': now}})
-            if result.deleted_count > 0:
-                logging.info(f"Scheduler: Cleaned up {result.deleted_count} old meeting room booking(s).")
+            archived_count = archive_ended_bookings(now)
+            release_ended_slots(now)
+            if archived_count > 0:
+                logging.info(f"Scheduler: Archived {archived_count} ended meeting room booking(s).")
+
+    def reconcile_parking_job():
+        """Catches drift in the parking counters (per-spot reservations, per-lot availability)."""
+        if not scheduler_lease.is_leader():
+            return
+        with app.app_context():
+            reconcile_reservation_counts()
+            reconcile_lot_stats()
 
+    scheduler_lease.start()
     scheduler = BackgroundScheduler(daemon=True)
-    scheduler.add_job(time_trigger_job, 'cron', minute='*')
-    # Run cleanup job every minute for more responsive calendar updates
-    scheduler.add_job(cleanup_old_bookings_job, 'cron', minute='*')
+    # Archive every minute; the TTL index on end_time later removes archived bookings.
+    scheduler.add_job(archive_bookings_job, 'cron', minute='*')
+    scheduler.add_job(reconcile_parking_job, 'interval', minutes=15)
     scheduler.start()
+    # Time-triggered automation rules are scheduled at their exact fire times.
+    TimeTriggerPlanner(scheduler, execute=run_rules, should_run=scheduler_lease.is_leader).start()
     app.config['SCHEDULER_RUNNING'] = True
     logging.info("Application: Background scheduler started.")
 
     return app
 
-if __name__ == '__main__':
+if __name__ == '__main__' and '--init-db' in sys.argv:
+    # Used by the production server (gunicorn.conf.py) to initialize the database once,
+    # before any worker starts.
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    initialize_database()
+elif __name__ == '__main__':
+    # Development server. In production run: gunicorn -c gunicorn.conf.py wsgi:app
     app = create_app()
     with app.app_context():
         initialize_database()
@@ -0,0 +1,51 @@
+"""Shared fixtures. The tests run against a real MongoDB server.
+
+The server is TEST_MONGO_URI (a local mongod by default), and the tests use a scratch
+database (TEST_MONGO_DATABASE, office_app_test by default) that is dropped before and
+after the session. Every test that needs the database is skipped when no server answers.
+
+    pip install -r requirements.txt pytest
+    python -m pytest tests
+"""
+import os
+import sys
+
+import pytest
+from pymongo import MongoClient
+from pymongo.errors import PyMongoError
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+TEST_MONGO_URI = os.getenv('TEST_MONGO_URI', 'mongodb://localhost:27017')
+TEST_DATABASE = os.getenv('TEST_MONGO_DATABASE', 'office_app_test')
+
+
+def _mongo_reachable():
+    probe = MongoClient(TEST_MONGO_URI, serverSelectionTimeoutMS=1000)
+    try:
+        probe.admin.command('ping')
+        return True
+    except PyMongoError:
+        return False
+    finally:
+        probe.close()
+
+
+@pytest.fixture(scope='session')
+def db():
+    """The scratch database, with the collections and indexes the application creates."""
+    if TEST_DATABASE == 'office_app_db':
+        pytest.exit("Refusing to run the tests against the application database.")
+    if not _mongo_reachable():
+        pytest.skip(f"No MongoDB server reachable at {TEST_MONGO_URI}.")
+    # Backend.database connects on import, so point it at the scratch database first.
+    os.environ['MONGO_URI'] = TEST_MONGO_URI
+    os.environ['MONGO_DATABASE'] = TEST_DATABASE
+    os.environ.setdefault('SECRET_KEY', 'test-secret-key-for-signing-tokens')
+    from Backend.database import client, db
+    from Backend.indexes import ensure_indexes
+
+    client.drop_database(TEST_DATABASE)
+    ensure_indexes()
+    yield db
+    client.drop_database(TEST_DATABASE)
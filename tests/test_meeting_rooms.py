@@ -0,0 +1,57 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+import jwt
+import pytest
+from flask import Flask
+
+CLIENTS = 20
+
+
+@pytest.fixture
+def client(db):
+    from Backend.meeting_rooms import meeting_rooms_bp
+
+    app = Flask(__name__)
+    app.config['SECRET_KEY'] = 'test-secret-key-for-signing-tokens'
+    app.register_blueprint(meeting_rooms_bp)
+    db.users.update_one(
+        {'username': 'racer'}, {'$set': {'username_lower': 'racer', 'role': 'user', 'password': 'unused'}}, upsert=True
+    )
+    token = jwt.encode({'username': 'racer'}, app.config['SECRET_KEY'], algorithm='HS256')
+    return app, {'Authorization': f'Bearer {token}'}
+
+
+def _race(app, headers, bookings):
+    """POSTs every booking at once, each from its own thread and test client. Returns the statuses."""
+    start_line = threading.Barrier(len(bookings))
+
+    def book(body):
+        test_client = app.test_client()
+        start_line.wait()
+        return test_client.post('/api/rooms/book', json=body, headers=headers).status_code
+
+    with ThreadPoolExecutor(max_workers=len(bookings)) as pool:
+        return list(pool.map(book, bookings))
+
+
+@pytest.mark.parametrize('room_id', ['race-new-room', 'race-booked-room'])
+def test_concurrent_overlapping_bookings_admit_exactly_one(db, client, room_id):
+    app, headers = client
+    start = datetime.now(timezone.utc).replace(microsecond=0) + timedelta(days=1)
+    if room_id == 'race-booked-room':
+        # The room already holds a booking, so its slot document exists before the race.
+        earlier = {'room_id': room_id, 'start_time': (start - timedelta(hours=2)).isoformat(), 'duration_minutes': 30}
+        assert app.test_client().post('/api/rooms/book', json=earlier, headers=headers).status_code == 201
+
+    # Every request starts within the hour the others book, so all of them overlap.
+    bookings = [
+        {'room_id': room_id, 'start_time': (start + timedelta(minutes=index)).isoformat(), 'duration_minutes': 60}
+        for index in range(CLIENTS)
+    ]
+    statuses = _race(app, headers, bookings)
+
+    assert statuses.count(201) == 1
+    assert statuses.count(409) == CLIENTS - 1
+    assert db.meeting_bookings.count_documents({'room_id': room_id, 'start_time': {'$gte': start}}) == 1
@@ -0,0 +1,12 @@
+def test_every_query_shape_is_index_backed(db):
+    from Backend.indexes import verify_query_plans
+
+    assert verify_query_plans() == []
+
+
+def test_query_shapes_cover_existing_collections(db):
+    # Explaining a query on a missing collection gives an EOF plan, which would pass unchecked.
+    from Backend.indexes import query_shapes
+
+    existing = set(db.list_collection_names())
+    assert {collection for collection, _, _ in query_shapes()} <= existing
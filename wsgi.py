@@ -0,0 +1,6 @@
+# WSGI entry point for the production server: gunicorn -c gunicorn.conf.py wsgi:app
+# The database is initialized once by the gunicorn master (see gunicorn.conf.py),
+# so workers only build the application.
+from main import create_app
+
+app = create_app()